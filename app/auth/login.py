@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.database.models import User
 from app.database.database import get_db
-from app.auth.security import verify_password, create_access_token
+from app.auth.security import verify_password, create_access_token, hash_password, needs_rehash, invalidate_principal
+from app.core.rate_limit import auth_rate_limit
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(auth_rate_limit)])
 async def login(
         form_data: OAuth2PasswordRequestForm = Depends(),
         db: AsyncSession = Depends(get_db)
@@ -23,12 +24,26 @@ async def login(
         raise HTTPException(status_code=400, 
         detail="User doesn\'t exist")
     
+    # Завершуємо транзакцію — з'єднання повертається в пул і не тримається під час bcrypt
+    await db.commit()
+
     is_password_correct = await verify_password(form_data.password, user.hashed_password)
 
     if not is_password_correct:
         raise HTTPException(status_code=401, 
         detail="Incorrect password")
 
+    if not user.is_active:
+        raise HTTPException(status_code=403,
+        detail="User is inactive")
+
+    # Змінилась вартість bcrypt — перехешовуємо, поки маємо пароль у відкритому вигляді
+    if needs_rehash(user.hashed_password):
+        new_hash = await hash_password(form_data.password)
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
+        await invalidate_principal(user.email)
+
     access_token = create_access_token(data={"sub": user.email})
 
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -4,12 +4,13 @@ from sqlalchemy import select, insert, or_
 
 from app.database.schemas import UserCreate, UserResponse
 from app.database.models import User
-from app.database.database import get_db
-from app.auth.security import hash_password
+from app.database.database import get_db, pin_to_primary
+from app.auth.security import hash_password, invalidate_principal
+from app.core.rate_limit import auth_rate_limit
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-@router.post("/register", response_model=UserResponse)
+@router.post("/register", response_model=UserResponse, dependencies=[Depends(auth_rate_limit)])
 async def register(user_data: UserCreate, 
                     db: AsyncSession = Depends(get_db)):
 
@@ -40,4 +41,7 @@ async def register(user_data: UserCreate,
     await db.commit()
 
     new_user = result.scalar_one()
+    await invalidate_principal(new_user.email)
+    # Одразу після реєстрації репліка може ще не мати юзера
+    await pin_to_primary(new_user.email)
     return new_user
\ No newline at end of file
@@ -3,13 +3,19 @@ from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import asyncio
+import json
 import os
 
+from redis.exceptions import RedisError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database.database import get_db
+from app.core.cache import TTLCache
+from app.core.redis_client import get_redis
+from app.database.database import get_read_db
 from app.database.models import User
 
 load_dotenv()
@@ -18,11 +24,36 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# bcrypt — CPU-важкий і блокуючий, тому виконується в окремому пулі потоків (bcrypt відпускає GIL)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "4"))
+# Скільки операцій може чекати в черзі; понад це — 503 замість нескінченної черги
+BCRYPT_MAX_PENDING = int(os.getenv("BCRYPT_MAX_PENDING", "64"))
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_bcrypt_slots = asyncio.Semaphore(BCRYPT_MAX_PENDING)
+
+# Кеш юзерів по "sub" з токена: локальний LRU (короткий TTL) + Redis (спільний для воркерів)
+PRINCIPAL_LOCAL_TTL = float(os.getenv("PRINCIPAL_LOCAL_TTL", "15"))
+PRINCIPAL_REDIS_TTL = int(os.getenv("PRINCIPAL_REDIS_TTL", "60"))
+_principal_cache = TTLCache(maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096")), ttl=PRINCIPAL_LOCAL_TTL)
+
+
+async def _run_bcrypt(func, *args):
+    """Виконати bcrypt у пулі потоків, не блокуючи event loop."""
+    if _bcrypt_slots.locked():
+        raise HTTPException(status_code=503,
+        detail="Too many authentication requests",
+        headers={"Retry-After": "1"})
+
+    async with _bcrypt_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_bcrypt_executor, func, *args)
+
 
 async def hash_password(password: str) -> str:
     byte_password = password.encode('utf-8')
-    salt = gensalt()
-    hashed_password = hashpw(byte_password, salt)
+    salt = gensalt(rounds=BCRYPT_ROUNDS)
+    hashed_password = await _run_bcrypt(hashpw, byte_password, salt)
     return hashed_password.decode('utf-8')
 
 
@@ -30,7 +61,19 @@ async def verify_password(plain_password: str, hashed_password_from_db: str) ->
     byte_password = plain_password.encode('utf-8')
     byte_hash = hashed_password_from_db.encode('utf-8')
 
-    return checkpw(byte_password, byte_hash)
+    return await _run_bcrypt(checkpw, byte_password, byte_hash)
+
+
+def needs_rehash(hashed_password_from_db: str) -> bool:
+    """Чи захешовано пароль з іншою вартістю, ніж BCRYPT_ROUNDS ("$2b$12$...")."""
+    try:
+        return int(hashed_password_from_db.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+def shutdown_password_hashing() -> None:
+    _bcrypt_executor.shutdown(wait=False, cancel_futures=True)
 
 
 def create_access_token(data: dict) -> str:
@@ -58,9 +101,79 @@ def verify_token(token: str) -> dict | None:
         return None  # Токен невалідний або протермінований
 
 
+def _principal_key(email: str) -> str:
+    return f"auth:principal:{email}"
+
+
+def _user_snapshot(user: User) -> dict:
+    # Пароль в кеш не потрапляє — ендпоїнтам він не потрібен
+    return {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "is_active": user.is_active,
+    }
+
+
+def _user_from_snapshot(snapshot: dict) -> User:
+    data = dict(snapshot)
+    if data.get("created_at"):
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    # Transient об'єкт (не прив'язаний до сесії) — тільки для читання полів
+    return User(**data)
+
+
+async def invalidate_principal(email: str) -> None:
+    """
+    Скинути кеш юзера — викликати після кожного коміту, що змінює рядок users
+    (реєстрація, перехешування пароля, деактивація). Виняток — users.change_seq:
+    його в знімку немає, тож record_changes кеш не чіпає.
+    Локальні кеші інших воркерів доживають максимум PRINCIPAL_LOCAL_TTL секунд.
+    """
+    _principal_cache.pop(email)
+    try:
+        await get_redis().delete(_principal_key(email))
+    except RedisError:
+        pass
+
+
+async def get_principal(email: str, db: AsyncSession) -> User | None:
+    """Знайти юзера по email: локальний кеш → Redis → БД."""
+    snapshot = _principal_cache.get(email)
+    if snapshot is not None:
+        return _user_from_snapshot(snapshot)
+
+    redis_client = get_redis()
+    try:
+        raw = await redis_client.get(_principal_key(email))
+    except RedisError:
+        raw = None
+
+    if raw:
+        snapshot = json.loads(raw)
+        _principal_cache.set(email, snapshot)
+        return _user_from_snapshot(snapshot)
+
+    stmt = select(User).where(User.email == email)
+    result = await db.execute(stmt)
+    user = result.scalar_one_or_none()
+    if user is None:
+        return None
+
+    snapshot = _user_snapshot(user)
+    _principal_cache.set(email, snapshot)
+    try:
+        await redis_client.setex(_principal_key(email), PRINCIPAL_REDIS_TTL, json.dumps(snapshot))
+    except RedisError:
+        pass
+
+    return user
+
+
 async def get_current_user(
         token: str = Depends(oauth2_scheme), 
-        db: AsyncSession = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
     ) -> User:
     
     payload = verify_token(token)
@@ -73,12 +186,14 @@ async def get_current_user(
         raise HTTPException(status_code=401, 
         detail="Invalid token")
 
-    stmt = select(User).where(User.email == email)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    user = await get_principal(email, db)
 
     if user is None:
         raise HTTPException(status_code=401, 
         detail="User not found") 
+
+    if not user.is_active:
+        raise HTTPException(status_code=403,
+        detail="User is inactive")
     
     return user
\ No newline at end of file
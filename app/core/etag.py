@@ -0,0 +1,34 @@
+# region Імпорти
+import os
+from fastapi import Request, Response
+# endregion
+
+# Статистика може бути трохи застарілою — браузер не питає сервер STATS_MAX_AGE секунд
+STATS_MAX_AGE = int(os.getenv("STATS_MAX_AGE", "10"))
+STATS_CACHE_CONTROL = f"private, max-age={STATS_MAX_AGE}"
+# Список і фільм — браузер кешує, але щоразу перевіряє через If-None-Match
+MOVIES_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(kind: str, user_id: int, version: int | str) -> str:
+    """
+    Слабкий ETag з версії даних юзера: номер змін (users.change_seq) — міняється при кожному записі,
+    для статистики — дайджест агрегату.
+    """
+    return f'W/"{kind}-{user_id}-{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match (слабке порівняння: W/ ігнорується)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -1,48 +1,123 @@
 # region Імпорти
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from queue import SimpleQueue
 # endregion
 
-def setup_logger():    
+# Рівні для окремих модулів: "database=INFO,tmdb=WARNING" → watchlist.database, watchlist.tmdb
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Яка частка DEBUG рядків потрапляє в лог (гарячі шляхи пишуть debug на кожен запит)
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+# Формат консолі: text (для людей) або json; файл — завжди JSON
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "text")
+
+# Один listener на процес — setup_logger() лише повертає вже налаштований логер
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Один JSON об'єкт на рядок."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    Стандартний prepare() вклеює traceback у msg і прибирає exc_info — JsonFormatter тоді не пише "exc".
+    Черга в межах процесу (без pickle), тож exc_info їде як є, а форматується вже в потоці listener'а.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class DebugSampler(logging.Filter):
+    """Пропускає всі записи від INFO і вище та лише частку DEBUG."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+def _configure(logger: logging.Logger) -> QueueListener:
     # Створюємо папку logs якщо її немає
     log_dir = Path("logs")
     log_dir.mkdir(exist_ok=True)
-    
+
     # Шлях до файлу логів
     log_file = log_dir / "watchlist.log"
-    
-    # Створюємо логер
-    logger = logging.getLogger("watchlist")
-    logger.setLevel(logging.DEBUG)
-    
-    # Очищаємо попередні handler'и (якщо є)
-    logger.handlers.clear()
-    
-    # Формат логів
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s',
+
+    text_formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(name)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
     # Handler для файлу з ротацією
     # Максимальний розмір файлу: 5 МБ, кількість backup файлів: 3
     file_handler = RotatingFileHandler(
-        log_file, 
+        log_file,
         maxBytes=5*1024*1024,  # 5 МБ
         backupCount=3,          # Зберігати 3 backup файли
         encoding='utf-8'
     )
     file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    
+    file_handler.setFormatter(JsonFormatter())
+
     # Handler для консолі
     console_handler = logging.StreamHandler()
     console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    
-    # Додаємо handler'и до логера
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+    console_handler.setFormatter(JsonFormatter() if LOG_CONSOLE_FORMAT == "json" else text_formatter)
+
+    # Логер лише кладе запис у чергу; диск і консоль — у потоці listener'а, не в event loop
+    queue: SimpleQueue = SimpleQueue()
+    queue_handler = LocalQueueHandler(queue)
+    queue_handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE_RATE))
+
+    logger.setLevel(logging.DEBUG)
+    logger.handlers.clear()
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    for item in filter(None, (part.strip() for part in LOG_LEVELS.split(","))):
+        module, _, level = item.partition("=")
+        logger.getChild(module.strip()).setLevel(level.strip().upper())
+
+    listener = QueueListener(queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def setup_logger(name: str | None = None) -> logging.Logger:
+    """
+    Логер "watchlist" (або дочірній "watchlist.<name>").
+    Handler'и створюються один раз на процес, повторні виклики їх не перебудовують.
+    """
+    global _listener
+
+    logger = logging.getLogger("watchlist")
+    if _listener is None:
+        _listener = _configure(logger)
+
+    return logger.getChild(name) if name else logger
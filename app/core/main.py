@@ -1,28 +1,43 @@
 # region Модулі для БД / Веба
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query
+from fastapi import FastAPI, Depends, HTTPException, WebSocket, WebSocketDisconnect, Query, UploadFile, File, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, delete, update, func, extract
+from sqlalchemy import select, insert, delete, update
 from app.auth.registration import router as auth_router
 from app.auth.login import router as login_router
-from app.auth.security import get_current_user
+from app.auth.security import get_current_user, shutdown_password_hashing
 from app.database.models import User
 from app.core.redis_client import get_redis, close_redis
-from app.services.tmdb import TMDBService
-from app.core.ws_manager import ConnectionManager
+from app.services.tmdb import TMDBService, create_http_client
+from app.services.importer import import_movies, detect_format, ImportFormatError
+from app.services.stats import apply_movie_delta, get_user_stats
+from app.core.ws_manager import WS_BROKER, ConnectionManager
 # endregion
 
 # region Python / Mine модулі
-import asyncio
-from collections import Counter
+import csv
+import io
+import json
 from jose import JWTError, jwt
-from app.core.mytools import is_none_filter
-from app.database.database import init_db, get_db
+from app.core.mytools import MOVIE_RESPONSE_COLUMNS, is_none_filter, with_watch_date, bulk_insert_movies, movie_payload
+from app.core.serialization import FastJSONResponse
+from app.core.rate_limit import rate_limit_stats, tmdb_rate_limit
+from app.core.etag import MOVIES_CACHE_CONTROL, STATS_CACHE_CONTROL, etag_matches, make_etag, not_modified
+from app.core.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, apply_keyset, decode_cursor, encode_cursor
+)
+from app.database.database import (
+    init_db, get_db, get_read_db, async_session, engine, replica_engine, replica_health, pool_stats, pin_to_primary
+)
 from app.core.logger import setup_logger
-from app.database.schemas import MovieResponse, MovieCreate, MovieUpdate, StatsResponse, MonthlyHistory, GenreCount
+from app.database.schemas import MovieResponse, MovieCreate, MovieUpdate, StatsResponse, ChangesResponse
 from app.database.models import Movie, MovieStatus
+from app.database.genres import sync_movie_genres, upsert_tmdb_genres
+from app.database.changes import get_change_seq, get_changes, record_changes
 from datetime import datetime
 import os
 # endregion
@@ -47,14 +62,33 @@ async def lifespan(app: FastAPI):
     redis = await get_redis()
     app_logger.info("Redis connected")
     
-    # Ініціалізувати TMDB сервіс з Redis клієнтом
-    from app.services.tmdb import TMDBService
+    # Ініціалізувати TMDB сервіс з Redis клієнтом і спільним пулом HTTP з'єднань
     global tmdb_service
-    tmdb_service = TMDBService(redis_client=redis)
+    http_client = create_http_client()
+    tmdb_service = TMDBService(redis_client=redis, http_client=http_client)
     app_logger.info("TMDB service initialized")
 
+    # Довідник жанрів TMDB → таблиця genres (прив'язка tmdb_id до назв)
+    try:
+        await tmdb_service.load_genres()
+        async with async_session() as session:
+            await upsert_tmdb_genres(session, await tmdb_service.get_genre_map())
+            await session.commit()
+    except Exception as e:
+        app_logger.warning(f"{section} | TMDB genres sync skipped: {e}")
+
+    # WS події між воркерами — через Redis pub/sub
+    if WS_BROKER == "redis":
+        await manager.start(redis)
+        app_logger.info("WS broker subscribed")
+
     yield
 
+    await manager.stop()
+
+    await http_client.aclose()
+    app_logger.info("TMDB HTTP client closed")
+    shutdown_password_hashing()
     await close_redis()
     app_logger.info("Redis disconnected")
     app_logger.info(f"{section} | Application shutting down")
@@ -71,18 +105,24 @@ def get_tmdb_service():
     return tmdb_service
 
 
-app = FastAPI(title="Movie Watchlist", lifespan=lifespan) # Створення екземляра FastAPI
+# Відповіді стискаються від GZIP_MIN_SIZE байт (маленькі — не варто CPU)
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+
+app = FastAPI(title="Movie Watchlist", lifespan=lifespan, default_response_class=FastJSONResponse) # Створення екземляра FastAPI
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Change-Seq", "Retry-After"],
 )
 
 app.include_router(login_router)
 app.include_router(auth_router)
-app_logger = setup_logger()
+app_logger = setup_logger("app")
 section = "APP"
 
 # Роздаємо фронтенд через HTTP (вирішує проблему null origin для WebSocket)
@@ -90,9 +130,27 @@ _frontend_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__
 app.mount("/app", StaticFiles(directory=_frontend_path, html=True), name="frontend")
 
 
+# ========== METRICS ==========
+
+@app.get('/metrics')
+async def metrics():
+    """Внутрішні лічильники процесу (кеші тощо)."""
+    return {
+        "tmdb": dict(tmdb_service.cache_stats) if tmdb_service else {},
+        "db_pool": pool_stats(engine),
+        "db_replica": {
+            **pool_stats(replica_engine),
+            "healthy": replica_health.healthy,
+            "lag": replica_health.lag,
+        } if replica_engine else None,
+        "ws": manager.stats(),
+        "rate_limited": dict(rate_limit_stats),
+    }
+
+
 # ========== TMDB API ==========
 
-@app.get('/movies/search')
+@app.get('/movies/search', dependencies=[Depends(tmdb_rate_limit)])
 async def search_tmdb_movies(
         query: str,
         page: int = 1,
@@ -103,11 +161,12 @@ async def search_tmdb_movies(
     Пошук фільмів в TMDB за назвою.
     Повертає список знайдених фільмів з постерами та описом.
     """
+    # Вже готові JSON-сумісні дані з кешу — без проходу jsonable_encoder
     results = await tmdb.search_and_format(query, page)
-    return results
+    return FastJSONResponse(results)
 
 
-@app.get('/movies/tmdb/{tmdb_id}')
+@app.get('/movies/tmdb/{tmdb_id}', dependencies=[Depends(tmdb_rate_limit)])
 async def get_tmdb_movie_details(
         tmdb_id: int,
         current_user: User = Depends(get_current_user),
@@ -118,22 +177,43 @@ async def get_tmdb_movie_details(
     Повертає повні дані: жанри, акторів, режисера, тривалість і т.д.
     """
     details = await tmdb.get_details_formatted(tmdb_id)
-    return details
+    return FastJSONResponse(details)
 
-# Точка GET для отримання списку фільмів ПО ФІЛЬТРАМ
+# Точка GET для отримання списку фільмів ПО ФІЛЬТРАМ (keyset пагінація)
 @app.get('/movies/', response_model=list[MovieResponse]) # (Pydantic) response_model відповідає за структуру відповіді ендпоїнта
 async def show_all_movies(
+        request: Request,
+        title: str | None = None,
         genre: str | None = None,
         year: int | None = None,
         status: MovieStatus | None = None,
+        sort: str = Query("added_date", pattern="^(added_date|year|user_rating|title)$"),
+        order: str = Query("desc", pattern="^(asc|desc)$"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        cursor: str | None = None,
         # (FastAPI) Dependency injection для використання БД
-        db: AsyncSession = Depends(get_db),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_user)
     ): 
+    """
+    Сторінка фільмів. Курсор на наступну сторінку — в заголовку X-Next-Cursor
+    (немає заголовка = це остання сторінка).
+    X-Change-Seq — номер змін юзера, з нього клієнт продовжує delta sync.
+    ETag з того ж номера: If-None-Match → 304 без запиту до таблиці фільмів.
+    Рядки БД серіалізуються в JSON напряму (без ORM об'єктів і повторної валідації MovieResponse).
+    """
+    # Номер читаємо ДО списку: зміни між ними клієнт просто отримає ще раз
+    seq = await get_change_seq(db, current_user.id)
+    etag = make_etag("movies", current_user.id, seq)
+    if etag_matches(request, etag):
+        return not_modified(etag, MOVIES_CACHE_CONTROL)
+
+    headers = {"X-Change-Seq": str(seq), "ETag": etag, "Cache-Control": MOVIES_CACHE_CONTROL}
 
-    stmt = select(Movie).where(Movie.user_id == current_user.id) # Створюємо SELECT запит
+    stmt = select(*MOVIE_RESPONSE_COLUMNS).where(Movie.user_id == current_user.id) # Створюємо SELECT запит
 
     filters = {
+        "title": title,
         "genre": genre,
         "year": year,
         "status": status
@@ -142,74 +222,134 @@ async def show_all_movies(
     conditions = await is_none_filter(**filters)
     if conditions:
         stmt = stmt.where(*conditions)
+
+    try:
+        after = decode_cursor(cursor, sort, order) if cursor else None
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stmt = apply_keyset(stmt, sort, order, after, limit)
         
     result = await db.execute(stmt) # Виконуєм + забираєм результат
-    movies = result.scalars().all() # Обробляєм результат
+    rows = result.all() # Обробляєм результат
+
+    # Взяли limit + 1 рядок — якщо зайвий є, то є і наступна сторінка
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(sort, order, rows[-1])
+
+    # Row → dict → bytes одним проходом
+    return FastJSONResponse([row._asdict() for row in rows], headers=headers)
+
+
+# Точка GET для ЕКСПОРТУ списку (NDJSON / CSV) — має бути ДО /movies/{movie_id} !
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "500"))
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+async def _export_rows(stmt, fmt: str):
+    """
+    Генератор рядків експорту: server-side курсор + серіалізація по одному фільму.
+    Окрема сесія — бо генератор живе довше за обробку запиту.
+    """
+    fields = list(MovieResponse.model_fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+
+    if fmt == "csv":
+        writer.writeheader()
+
+    async with async_session() as session:
+        result = await session.stream_scalars(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        async for movie in result:
+            row = MovieResponse.model_validate(movie).model_dump(mode="json")
+            if fmt == "csv":
+                writer.writerow(row)
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+            # Віддаємо накопичене шматками ~64 КБ і чистимо буфер — пам'ять не росте
+            if buffer.tell() >= EXPORT_FLUSH_BYTES:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+    # Залишок (або тільки заголовок CSV, якщо список порожній)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@app.get('/movies/export')
+async def export_movies(
+        format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+        title: str | None = None,
+        genre: str | None = None,
+        year: int | None = None,
+        status: MovieStatus | None = None,
+        current_user: User = Depends(get_current_user)
+    ):
+    stmt = select(Movie).where(Movie.user_id == current_user.id).order_by(Movie.id)
 
-    return movies
+    conditions = await is_none_filter(title=title, genre=genre, year=year, status=status)
+    if conditions:
+        stmt = stmt.where(*conditions)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="watchlist.{format}"'}
+    )
+
+
+# Точка GET для DELTA SYNC — має бути ДО /movies/{movie_id} !
+@app.get("/movies/changes", response_model=ChangesResponse)
+async def movie_changes(
+        since: int = Query(..., ge=0),
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_user)
+    ):
+    """
+    Зміни після номера since (з X-Change-Seq або поля seq WS події):
+    актуальні версії змінених фільмів і id видалених.
+    reset=True — журнал вже не покриває since, список треба завантажити повністю.
+    """
+    return await get_changes(db, current_user.id, since)
 
 
 # Точка GET для СТАТИСТИКИ — має бути ДО /movies/{movie_id} !
 @app.get("/movies/stats/", response_model=StatsResponse)
 async def user_stats(
-        db: AsyncSession = Depends(get_db),
+        request: Request,
+        response: Response,
         current_user: User = Depends(get_current_user)):
-    
-    stmt = select(Movie.status, func.count(Movie.id).label("count")
-    ).where(Movie.user_id == current_user.id).group_by(Movie.status)
-    response = await db.execute(stmt)
-    status_rows = response.all()
-    by_status = {row._mapping["status"].value: int(row._mapping["count"]) for row in status_rows}
-
-    genre_stmt = select(Movie.genre).where(Movie.user_id == current_user.id)
-    genre_result = await db.execute(genre_stmt)
-    genres_raw = genre_result.scalars().all()
-    counter = Counter()
-    for genre_str in genres_raw:
-        for genre in genre_str.split(","):
-            counter[genre.strip()] += 1
-    top_genres = [GenreCount(name=g, count=c) for g, c in counter.most_common(5)]
-
-    monthly_stmt = (
-        select(
-            extract('year', Movie.watch_date).label("year"),
-            extract('month', Movie.watch_date).label("month"),
-            func.count(Movie.id).label("count")
-        )
-        .where(
-            Movie.user_id == current_user.id,
-            Movie.status == MovieStatus.watched,
-            Movie.watch_date.isnot(None)
-        )
-        .group_by(
-            extract('year', Movie.watch_date),
-            extract('month', Movie.watch_date)
-        )
-        .order_by(
-            extract('year', Movie.watch_date),
-            extract('month', Movie.watch_date)
-        )
-    )
-    monthly_result = await db.execute(monthly_stmt)
-    monthly_rows = monthly_result.all()
-    monthly_history = [
-        MonthlyHistory(year=int(r._mapping["year"]), month=int(r._mapping["month"]), count=int(r._mapping["count"]))
-        for r in monthly_rows
-    ]
-
-    return StatsResponse(
-        by_status=by_status,
-        top_genres=top_genres,
-        monthly_history=monthly_history
-    )
+    """
+    Статистика з агрегату в Redis (оновлюється інкрементально ендпоїнтами запису).
+    ETag — з вмісту самого агрегату, а не з users.change_seq: між комітом і дельтою вони розходяться.
+    """
+    version, stats = await get_user_stats(get_redis(), current_user.id)
+    etag = make_etag("stats", current_user.id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag, STATS_CACHE_CONTROL)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = STATS_CACHE_CONTROL
+    return stats
 
 
 # Точка GET для отримання фільму по АЙДІ
 @app.get("/movies/{movie_id}", response_model=MovieResponse)
 async def show_one_movie(movie_id: int, 
-            db: AsyncSession = Depends(get_db),
+            request: Request,
+            response: Response,
+            db: AsyncSession = Depends(get_read_db),
             current_user: User = Depends(get_current_user)
     ):
+    etag = make_etag(f"movie-{movie_id}", current_user.id, await get_change_seq(db, current_user.id))
+    if etag_matches(request, etag):
+        return not_modified(etag, MOVIES_CACHE_CONTROL)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = MOVIES_CACHE_CONTROL
     stmt = select(Movie).where(Movie.user_id == current_user.id, 
                                 Movie.id == movie_id)
     result = await db.execute(stmt)
@@ -226,10 +366,7 @@ async def add_movie(append_movie: MovieCreate,
     
     data = append_movie.model_dump(exclude_unset=True)
     data['user_id'] = current_user.id
-
-    # Автоматично ставимо дату перегляду якщо статус watched
-    if data.get('status') == MovieStatus.watched and not data.get('watch_date'):
-        data['watch_date'] = datetime.now()
+    with_watch_date(data)
 
     if not data:
         raise HTTPException(status_code=404, 
@@ -237,18 +374,90 @@ async def add_movie(append_movie: MovieCreate,
     
     stmt = insert(Movie).values(**data).returning(Movie) # Створюємо команду INSERT і повертаємо об'єкт
     result = await db.execute(stmt) # Виконуємо
+    new_movie = result.scalar_one()
+    await sync_movie_genres(db, [(new_movie.id, new_movie.genre)])
+    prev_seq, seq = await record_changes(db, current_user.id, [new_movie.id])
     await db.commit() # Відправляємо зміни на БД
+    await apply_movie_delta(get_redis(), current_user.id, seq, added=[new_movie])
+    await pin_to_primary(current_user.email)
     
-    new_movie = result.scalar_one()
     app_logger.info(f"{section} | {new_movie.title} has appended to database")
 
     await manager.broadcast_to_user(current_user.id, {
         "event": "added",
-        "movie": {"id": new_movie.id, "title": new_movie.title, "status": new_movie.status.value} # type: ignore
+        "prev_seq": prev_seq,
+        "seq": seq,
+        "movie": movie_payload(new_movie)
     })
 
     return new_movie
 
+# Точка POST для ДОДАВАННЯ багатьох фільмів однією транзакцією (імпорт історії)
+MAX_BULK_MOVIES = int(os.getenv("MAX_BULK_MOVIES", "5000"))
+
+@app.post("/movies/bulk", response_model=list[MovieResponse])
+async def add_movies_bulk(append_movies: list[MovieCreate],
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user)
+    ):
+
+    if not append_movies:
+        raise HTTPException(status_code=400,
+        detail="Movies list is empty")
+
+    if len(append_movies) > MAX_BULK_MOVIES:
+        raise HTTPException(status_code=413,
+        detail=f"Too many movies (max {MAX_BULK_MOVIES})")
+
+    # model_dump() без exclude_unset — у всіх рядків однаковий набір колонок
+    rows = [with_watch_date({**movie.model_dump(), 'user_id': current_user.id}) for movie in append_movies]
+    new_movies = await bulk_insert_movies(db, rows)
+    prev_seq, seq = await record_changes(db, current_user.id, [m.id for m in new_movies])
+    await db.commit()
+    await apply_movie_delta(get_redis(), current_user.id, seq, added=new_movies)
+    await pin_to_primary(current_user.email)
+    app_logger.info(f"{section} | {len(new_movies)} movies have appended to database")
+
+    # Одна агрегована подія замість події на кожен фільм
+    await manager.broadcast_to_user(current_user.id, {
+        "event": "bulk_added",
+        "prev_seq": prev_seq,
+        "seq": seq,
+        "count": len(new_movies),
+        "movies": [movie_payload(m) for m in new_movies]
+    })
+
+    return new_movies
+
+# Точка POST для ІМПОРТУ експорту (CSV з Letterboxd / IMDb, JSON / NDJSON)
+@app.post("/movies/import")
+async def import_movies_file(
+        file: UploadFile = File(...),
+        status: MovieStatus = MovieStatus.watched,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_user),
+        tmdb: TMDBService = Depends(get_tmdb_service)
+    ):
+    """
+    Потоковий імпорт файлу: рядки валідуються через MovieCreate і пишуться пачками.
+    status — статус для рядків, де його немає у файлі.
+    """
+    fmt = detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400,
+        detail="Unsupported file format (use .csv, .json or .ndjson)")
+
+    try:
+        result = await import_movies(file.file, fmt, db, current_user.id, manager, tmdb, status)
+    except (csv.Error, json.JSONDecodeError, UnicodeDecodeError, ImportFormatError) as e:
+        # Пачки до помилки вже збережені
+        raise HTTPException(status_code=400,
+        detail=f"File is malformed: {e}")
+
+    await pin_to_primary(current_user.email)
+    app_logger.info(f"{section} | Import for user {current_user.id}: {result}")
+    return result
+
 # Точка PATCH для ОНОВЛЕННЯ фільму через АЙДІ
 @app.patch("/movies/{movie_id}", response_model=MovieResponse)
 async def update_movie(movie_id: int, 
@@ -261,25 +470,41 @@ async def update_movie(movie_id: int,
         data['updated_date'] = datetime.now()
 
     # Автоматично ставимо дату перегляду якщо статус змінено на watched
-    if data.get('status') == MovieStatus.watched and not data.get('watch_date'):
-        data['watch_date'] = datetime.now()
+    with_watch_date(data)
     
     if not data:
         raise HTTPException(status_code=404, 
         detail="Movie is not exist")
 
+    # Стара версія потрібна для інкрементального оновлення статистики
+    old_stmt = (
+        select(Movie.status, Movie.genre, Movie.watch_date)
+        .where(Movie.user_id == current_user.id, Movie.id == movie_id)
+        .with_for_update()
+    )
+    old_movie = (await db.execute(old_stmt)).one_or_none()
+
     stmt = update(Movie).where(Movie.user_id == current_user.id, Movie.id == movie_id).values(data).returning(Movie)
     result = await db.execute(stmt)
     updated_movie=result.scalar_one_or_none()
+    if updated_movie and 'genre' in data:
+        await sync_movie_genres(db, [(updated_movie.id, updated_movie.genre)], replace=True)
+    if updated_movie:
+        prev_seq, seq = await record_changes(db, current_user.id, [updated_movie.id])
     await db.commit()
 
     if not updated_movie:
         raise HTTPException(status_code=404,
         detail="Movie not found")
 
+    await apply_movie_delta(get_redis(), current_user.id, seq, removed=[old_movie], added=[updated_movie])
+    await pin_to_primary(current_user.email)
+
     await manager.broadcast_to_user(current_user.id, {
         "event": "updated",
-        "movie": {"id": updated_movie.id, "title": updated_movie.title, "status": updated_movie.status.value} # type: ignore
+        "prev_seq": prev_seq,
+        "seq": seq,
+        "movie": movie_payload(updated_movie)
     })
 
     return updated_movie
@@ -293,14 +518,21 @@ async def delete_movie(movie_id: int,
     stmt = delete(Movie).where(Movie.user_id == current_user.id, Movie.id == movie_id).returning(Movie)
     result = await db.execute(stmt)
     deleted_movie = result.scalar_one_or_none()
+    if deleted_movie:
+        prev_seq, seq = await record_changes(db, current_user.id, [movie_id])
     await db.commit()
 
     if not deleted_movie:
         raise HTTPException(status_code=404,
         detail="Movie not found")
 
+    await apply_movie_delta(get_redis(), current_user.id, seq, removed=[deleted_movie])
+    await pin_to_primary(current_user.email)
+
     await manager.broadcast_to_user(current_user.id, {
         "event": "deleted",
+        "prev_seq": prev_seq,
+        "seq": seq,
         "movie_id": movie_id
     })
 
@@ -312,8 +544,7 @@ async def delete_movie(movie_id: int,
 @app.websocket("/ws")
 async def websocket_endpoint(
         websocket: WebSocket,
-        token: str = Query(...),
-        db: AsyncSession = Depends(get_db)
+        token: str = Query(...)
     ):
     """
     WebSocket ендпоїнт з JWT автентифікацією через query param ?token=<jwt>
@@ -322,8 +553,7 @@ async def websocket_endpoint(
     ВАЖЛИВО: спочатку accept(), потім перевірка — бо close() без accept() 
     призводить до network error (code 1006) у браузері.
     """
-    from app.auth.security import verify_token
-    from sqlalchemy import select as sa_select
+    from app.auth.security import verify_token, get_principal
 
     # Спочатку приймаємо WS handshake
     await websocket.accept()
@@ -333,23 +563,30 @@ async def websocket_endpoint(
         await websocket.close(code=4001, reason="Invalid token")
         return
 
+    # Сесія лише на час перевірки юзера — з'єднання з пулу не тримається весь час життя сокета
     email = payload.get("sub")
-    stmt = sa_select(User).where(User.email == email)
-    result = await db.execute(stmt)
-    user = result.scalar_one_or_none()
+    async with async_session() as db:
+        user = await get_principal(email, db) if email else None
 
     if user is None:
         await websocket.close(code=4001, reason="User not found")
         return
 
-    await manager.connect(user.id, websocket)
+    if not user.is_active:
+        await websocket.close(code=4001, reason="User is inactive")
+        return
+
+    close_code = await manager.connect(user.id, websocket)
+    if close_code is not None:
+        await websocket.close(code=close_code, reason="Too many connections")
+        return
     app_logger.info(f"WS | User {user.email} connected")
 
     try:
-        while True:
-            # Чекаємо ping або повідомлення від клієнта (підтримуємо з'єднання живим)
-            await websocket.receive_text()
+        await manager.listen(user.id, websocket)
+        app_logger.info(f"WS | User {user.email} idle socket closed")
     except WebSocketDisconnect:
-        manager.disconnect(user.id, websocket)
         app_logger.info(f"WS | User {user.email} disconnected")
+    finally:
+        await manager.disconnect(user.id, websocket)
 
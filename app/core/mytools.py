@@ -1,7 +1,18 @@
 # region Імпорти
-from app.database.models import Movie
+from datetime import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.genres import sync_movie_genres
+from app.database.models import Genre, Movie, MovieGenre, MovieStatus
+from app.database.schemas import MovieResponse
 # endregion
 
+# Колонки відповіді MovieResponse — для списків, що серіалізуються з рядків БД напряму
+MOVIE_RESPONSE_COLUMNS = tuple(getattr(Movie, name) for name in MovieResponse.model_fields)
+
+# Скільки рядків в одному INSERT (asyncpg має ліміт 32767 параметрів на запит)
+BULK_INSERT_CHUNK = 1000
+
 
 async def is_none_filter(**kwargs):
     filters = {**kwargs}
@@ -13,8 +24,51 @@ async def is_none_filter(**kwargs):
             if column is not None:
                 
                 if field_name == "genre":
+                    # Пошук по довіднику жанрів (маленька таблиця) + індексний join через movie_genres
+                    genre_movies = (
+                        select(MovieGenre.movie_id)
+                        .join(Genre, Genre.id == MovieGenre.genre_id)
+                        .where(Genre.name.ilike(f"%{value}%"))
+                    )
+                    result.append(Movie.id.in_(genre_movies))
+                elif field_name == "title":
+                    # ILIKE '%...%' використовує trigram індекс ix_movies_title_trgm
                     result.append(column.ilike(f"%{value}%"))
                 else:
                     result.append(column == value)
                     
-    return result
\ No newline at end of file
+    return result
+
+
+def movie_payload(movie: Movie) -> dict:
+    """Повна версія фільму для WS подій (та сама форма, що й MovieResponse)."""
+    return MovieResponse.model_validate(movie).model_dump(mode="json")
+
+
+def with_watch_date(data: dict) -> dict:
+    # Автоматично ставимо дату перегляду якщо статус watched
+    if data.get('status') == MovieStatus.watched and not data.get('watch_date'):
+        data['watch_date'] = datetime.now()
+    return data
+
+
+async def bulk_insert_movies(db: AsyncSession, rows: list[dict]) -> list[Movie]:
+    """
+    Вставка багатьох фільмів multi-row INSERT ... RETURNING (пачками по BULK_INSERT_CHUNK).
+    Коміт — на стороні того, хто викликає (щоб усе йшло однією транзакцією).
+    """
+    # Однаковий набір ключів у кожному рядку: ORM групує рядки за ключами,
+    # і змішані статуси (watch_date лише у watched) розпадались на окремі INSERT.
+    # render_nulls — те саме для None: без нього ORM викидає такі ключі з рядка
+    for row in rows:
+        row.setdefault("watch_date", None)
+
+    inserted: list[Movie] = []
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        chunk = rows[start:start + BULK_INSERT_CHUNK]
+        stmt = insert(Movie).returning(Movie, sort_by_parameter_order=True)
+        result = await db.execute(stmt, chunk, execution_options={"render_nulls": True})
+        new_movies = result.scalars().all()
+        await sync_movie_genres(db, [(movie.id, movie.genre) for movie in new_movies])
+        inserted.extend(new_movies)
+    return inserted
@@ -0,0 +1,130 @@
+# region Імпорти
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+from sqlalchemy import Row, Select, and_, select, tuple_, union_all
+from app.database.models import Movie
+# endregion
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Ключі сортування → колонка (завжди з id як tie-breaker, під індекси (user_id, col, id))
+SORT_COLUMNS = {
+    "added_date": Movie.added_date,
+    "year": Movie.year,
+    "user_rating": Movie.user_rating,
+    "title": Movie.title,
+}
+# Колонки, які можуть бути NULL (NULL вважається "більшим" за будь-яке значення, як у Postgres)
+NULLABLE_SORTS = {"added_date", "user_rating"}
+# Межі INTEGER у Postgres — більше число asyncpg не передасть (і це була б 500)
+INT_MIN, INT_MAX = -2**31, 2**31 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, order: str, movie: Movie | Row) -> str:
+    """Непрозорий курсор: base64(JSON) з останнім значенням сортування і id (з ORM об'єкта або рядка)."""
+    value = getattr(movie, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+
+    payload = json.dumps({"s": sort, "o": order, "v": value, "id": movie.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and INT_MIN <= value <= INT_MAX
+
+
+def _sort_value(sort: str, value):
+    """Перевірити тип значення з курсора під колонку сортування (ValueError — не той тип)."""
+    if value is None:
+        if sort not in NULLABLE_SORTS:
+            raise ValueError(f"{sort} can not be null")
+        return None
+
+    if sort == "added_date" and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if sort == "year" and _is_int(value):
+        return value
+    if sort == "user_rating" and isinstance(value, (int, float)) and not isinstance(value, bool) \
+            and math.isfinite(value):
+        return float(value)
+    if sort == "title" and isinstance(value, str):
+        return value
+    raise ValueError(f"Bad {sort} value")
+
+
+def decode_cursor(token: str, sort: str, order: str) -> tuple:
+    """
+    Розібрати курсор → (значення, id). Курсор має відповідати поточному сортуванню.
+    Будь-який зіпсований курсор (формат, типи, значення) → InvalidCursor, а не помилка БД.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        if payload.get("s") != sort or payload.get("o") != order:
+            raise InvalidCursor("Cursor does not match sort order")
+
+        last_id = payload["id"]
+        if not _is_int(last_id):
+            raise ValueError("Bad id")
+        return _sort_value(sort, payload["v"]), last_id
+    except InvalidCursor:
+        raise
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError):
+        raise InvalidCursor("Cursor is malformed")
+
+
+def _order(stmt: Select, column, row_id, desc: bool) -> Select:
+    if desc:
+        return stmt.order_by(column.desc(), row_id.desc())
+    return stmt.order_by(column.asc(), row_id.asc())
+
+
+def _concat_ranges(stmt: Select, sort: str, desc: bool, first, second, limit: int) -> Select:
+    """
+    Сторінка, що переходить з одного діапазону індексу в інший (блок NULL-ів ↔ значення).
+    OR двох умов Postgres не читає з індексу по порядку і сортує весь список юзера,
+    а UNION ALL двох range scan'ів з LIMIT — це сортування лише 2 * (limit + 1) рядків.
+    """
+    column = SORT_COLUMNS[sort]
+    parts = [_order(stmt.where(condition), column, Movie.id, desc).limit(limit + 1) for condition in (first, second)]
+    page = union_all(*parts).subquery()
+    return _order(select(*page.c), page.c[sort], page.c.id, desc).limit(limit + 1)
+
+
+def apply_keyset(stmt: Select, sort: str, order: str, cursor: tuple | None, limit: int) -> Select:
+    """
+    Додати до запиту keyset-умову, ORDER BY і LIMIT (limit + 1, щоб знати чи є наступна сторінка).
+    Порядок NULL — дефолтний для Postgres (ASC NULLS LAST / DESC NULLS FIRST),
+    щоб обидва напрямки читались з одного індексу.
+    """
+    column = SORT_COLUMNS[sort]
+    desc = order == "desc"
+
+    if cursor is not None:
+        value, last_id = cursor
+
+        if value is None:
+            # Ми всередині блоку NULL-ів; у desc після нього йдуть усі значення
+            in_nulls = and_(column.is_(None), Movie.id < last_id if desc else Movie.id > last_id)
+            if desc:
+                return _concat_ranges(stmt, sort, desc, in_nulls, column.isnot(None), limit)
+            stmt = stmt.where(in_nulls)
+        else:
+            # Row-value порівняння — чистий range scan по індексу (NULL-и під нього не потрапляють)
+            key = tuple_(column, Movie.id)
+            after = key < tuple_(value, last_id) if desc else key > tuple_(value, last_id)
+            if sort in NULLABLE_SORTS and not desc:
+                # В asc NULL-и йдуть після всіх значень
+                return _concat_ranges(stmt, sort, desc, after, column.is_(None), limit)
+            stmt = stmt.where(after)
+
+    return _order(stmt, column, Movie.id, desc).limit(limit + 1)
@@ -0,0 +1,165 @@
+# region Імпорти
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import Counter
+
+from fastapi import Depends, HTTPException, Request
+from redis.exceptions import RedisError
+
+from app.auth.security import get_current_user
+from app.core.cache import TTLCache
+from app.core.redis_client import get_redis
+from app.database.models import User
+# endregion
+
+# Ліміти груп ендпоїнтів у форматі "кількість/секунди" (порожній рядок — без ліміту)
+# tmdb — запити юзера до /movies/search і /movies/tmdb/{id};
+# tmdb_upstream — спільний на всі воркери ліміт реальних запитів до TMDB API (квота ключа, кеш не рахується);
+# tmdb_import — дозаповнення рядків імпорту з TMDB на юзера (окремо, щоб імпорт не з'їдав ні ліміт пошуку юзера,
+# ні весь спільний tmdb_upstream);
+# auth — логін/реєстрація на IP (кожна спроба — це bcrypt)
+RATE_LIMIT_TMDB = os.getenv("RATE_LIMIT_TMDB", "30/10")
+RATE_LIMIT_TMDB_UPSTREAM = os.getenv("RATE_LIMIT_TMDB_UPSTREAM", "40/1")
+RATE_LIMIT_TMDB_IMPORT = os.getenv("RATE_LIMIT_TMDB_IMPORT", "10/1")
+RATE_LIMIT_AUTH = os.getenv("RATE_LIMIT_AUTH", "10/60")
+
+# Token bucket атомарно в Redis: дозаповнення за часом сервера Redis + списання одного токена
+_TAKE_TOKEN_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call("time")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local bucket = redis.call("hmget", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_after = (1 - tokens) / rate
+end
+
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("pexpire", KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+logger = logging.getLogger("watchlist.ratelimit")
+
+# Відмови по групах — для /metrics
+rate_limit_stats: Counter[str] = Counter()
+
+
+class Limit:
+    """Ліміт "N/секунди": N — розмір відра (burst), N/секунди — швидкість дозаповнення."""
+
+    def __init__(self, spec: str):
+        count, _, period = spec.partition("/")
+        self.capacity = int(count)
+        self.rate = self.capacity / float(period)
+
+
+def parse_limit(spec: str) -> Limit | None:
+    return Limit(spec) if spec.strip() else None
+
+
+class _LocalBuckets:
+    """Fallback, коли Redis недоступний: ті самі відра, але в межах процесу."""
+
+    def __init__(self):
+        # { key: (tokens, updated_at) }; запис живе стільки, скільки відро наповнюється з нуля
+        self._buckets = TTLCache(maxsize=10_000)
+
+    def take(self, key: str, limit: Limit) -> tuple[bool, float]:
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key) or (limit.capacity, now)
+        tokens = min(limit.capacity, tokens + (now - ts) * limit.rate)
+
+        allowed = tokens >= 1
+        retry_after = 0.0 if allowed else (1 - tokens) / limit.rate
+        if allowed:
+            tokens -= 1
+
+        self._buckets.set(key, (tokens, now), ttl=limit.capacity / limit.rate)
+        return allowed, retry_after
+
+
+_local = _LocalBuckets()
+_redis_down = False
+
+
+async def _take(key: str, limit: Limit) -> tuple[bool, float]:
+    global _redis_down
+    try:
+        allowed, retry_after = await get_redis().eval( # type: ignore
+            _TAKE_TOKEN_SCRIPT, 1, key, limit.capacity, limit.rate
+        )
+    except RedisError as e:
+        if not _redis_down:
+            logger.warning(f"RATELIMIT | Redis is unavailable, using in-process buckets: {e}")
+            _redis_down = True
+        return _local.take(key, limit)
+
+    _redis_down = False
+    return bool(allowed), float(retry_after)
+
+
+async def check_rate_limit(group: str, subject: str, limit: Limit | None) -> None:
+    """Списати токен з відра "ratelimit:{group}:{subject}"; порожнє відро → 429 з Retry-After."""
+    if limit is None:
+        return
+
+    allowed, retry_after = await _take(f"ratelimit:{group}:{subject}", limit)
+    if not allowed:
+        rate_limit_stats[group] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+async def wait_rate_limit(group: str, subject: str, limit: Limit | None) -> None:
+    """Як check_rate_limit, але для фонової роботи: чекати на токен замість 429."""
+    if limit is None:
+        return
+
+    while True:
+        allowed, retry_after = await _take(f"ratelimit:{group}:{subject}", limit)
+        if allowed:
+            return
+        await asyncio.sleep(retry_after)
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+# Ліміти груп (розбираються один раз при імпорті)
+TMDB_LIMIT = parse_limit(RATE_LIMIT_TMDB)
+TMDB_UPSTREAM_LIMIT = parse_limit(RATE_LIMIT_TMDB_UPSTREAM)
+TMDB_IMPORT_LIMIT = parse_limit(RATE_LIMIT_TMDB_IMPORT)
+AUTH_LIMIT = parse_limit(RATE_LIMIT_AUTH)
+
+
+async def auth_rate_limit(request: Request) -> None:
+    """Dependency для /auth/*: ліміт на IP."""
+    await check_rate_limit("auth", client_ip(request), AUTH_LIMIT)
+
+
+async def tmdb_rate_limit(current_user: User = Depends(get_current_user)) -> None:
+    """Dependency для TMDB ендпоїнтів: ліміт на юзера (токен вже перевірений)."""
+    await check_rate_limit("tmdb", str(current_user.id), TMDB_LIMIT)
+
+
+async def tmdb_upstream_rate_limit() -> None:
+    """Перед кожним реальним запитом до TMDB API."""
+    await check_rate_limit("tmdb_upstream", "global", TMDB_UPSTREAM_LIMIT)
@@ -0,0 +1,23 @@
+# region Імпорти
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+# endregion
+
+
+def dumps(obj: Any) -> bytes:
+    """Компактна серіалізація в JSON bytes (дати з рядків БД і Enum orjson серіалізує сам)."""
+    return orjson.dumps(obj)
+
+
+def loads(data: str | bytes) -> Any:
+    """Десеріалізація JSON з str або bytes."""
+    return orjson.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Дефолтний клас відповіді застосунку: рендер через orjson, без проходу jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,39 +1,263 @@
+import asyncio
 import json
+import logging
+import os
+import time
+from collections import Counter
+
+import redis.asyncio as redis
 from fastapi import WebSocket
+from redis.exceptions import RedisError
+
+# local — події тільки в межах процесу; redis — через pub/sub між усіма воркерами
+WS_BROKER = os.getenv("WS_BROKER", "local")
+CHANNEL_PREFIX = "ws:user:"
+# Службовий канал: pub/sub з'єднання не можна слухати без жодної підписки
+CONTROL_CHANNEL = "ws:control"
+
+# Скільки повідомлень може чекати відправки в одному сокеті
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "64"))
+# Скільки чекаємо на одну відправку, перш ніж вважати сокет мертвим
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# Що робити з повільним клієнтом, чия черга переповнена:
+# disconnect — закрити сокет (клієнт перепідключиться), drop — викидати найстаріші повідомлення
+WS_SLOW_CONSUMER = os.getenv("WS_SLOW_CONSUMER", "disconnect")
+
+# Heartbeat: сервер шле {"event": "ping"} кожні WS_PING_INTERVAL секунд тиші,
+# сокет без жодного повідомлення від клієнта довше WS_IDLE_TIMEOUT закривається
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "25"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+# Ліміти з'єднань: на юзера і на воркер
+WS_MAX_PER_USER = int(os.getenv("WS_MAX_PER_USER", "10"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+
+PING_MESSAGE = json.dumps({"event": "ping"})
+# Коди закриття: 4029 — ліміт вкладок юзера (клієнт не перепідключається), 1013 — воркер переповнений
+CLOSE_USER_LIMIT = 4029
+CLOSE_TRY_AGAIN = 1013
+CLOSE_IDLE = 1001
+
+# Закриття сокетів у фоні — тримаємо посилання, щоб задачі не зібрав GC
+_background: set[asyncio.Task] = set()
+
+logger = logging.getLogger("watchlist.ws")
+
+
+class SocketWriter:
+    """
+    Черга вихідних повідомлень одного сокета і задача, що їх відправляє.
+    Повільна вкладка не затримує інші, а broadcast не чекає на мережу.
+    """
+
+    def __init__(self, manager: "ConnectionManager", user_id: int, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.task = asyncio.create_task(self._run())
+
+    def push(self, data: str) -> bool:
+        """Поставити повідомлення в чергу. False — черга переповнена і клієнта треба відключити."""
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            if WS_SLOW_CONSUMER != "drop":
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(data)
+        return True
+
+    def stop(self, code: int | None = None):
+        """Зупинити відправку; з code — ще й закрити сокет (у фоні, з таймаутом)."""
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+        if code is not None:
+            task = asyncio.create_task(self._close(code))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+
+    async def _close(self, code: int):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    async def _run(self):
+        while True:
+            data = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(data), WS_SEND_TIMEOUT)
+            except Exception as e:
+                logger.info(f"WS | Send to user {self.user_id} failed, dropping socket: {e!r}")
+                self.manager.counters["send_failed"] += 1
+                await self.manager.disconnect(self.user_id, self.websocket, code=1011)
+                return
 
 
 class ConnectionManager:
     """
     Керує WebSocket з'єднаннями.
     Один юзер може мати декілька вкладок (список сокетів на user_id).
+
+    У режимі брокера подія публікується в канал "ws:user:{user_id}",
+    а кожен воркер підписаний лише на юзерів, чиї сокети відкриті саме в ньому.
     """
 
     def __init__(self):
-        # { user_id: [WebSocket, ...] }
-        self.active: dict[int, list[WebSocket]] = {}
+        # { user_id: [SocketWriter, ...] }
+        self.active: dict[int, list[SocketWriter]] = {}
+        self._redis: redis.Redis | None = None
+        self._pubsub = None
+        self._listener: asyncio.Task | None = None
+        self.connections = 0
+        # rejected / reaped / slow / send_failed
+        self.counters: Counter[str] = Counter()
 
-    async def connect(self, user_id: int, websocket: WebSocket):
-        # Увага: accept() виконується в ендпоїнті ДО виклику connect()
-        if user_id not in self.active:
-            self.active[user_id] = []
-        self.active[user_id].append(websocket)
+    async def start(self, redis_client: redis.Redis):
+        """Увімкнути режим брокера (викликається з lifespan)."""
+        self._redis = redis_client
+        self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(CONTROL_CHANNEL)
+        self._listener = asyncio.create_task(self._listen())
 
-    def disconnect(self, user_id: int, websocket: WebSocket):
-        if user_id in self.active:
-            self.active[user_id].remove(websocket)
-            if not self.active[user_id]:
-                del self.active[user_id]
+    async def stop(self):
+        for writers in self.active.values():
+            for writer in writers:
+                writer.stop()
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        self._redis = self._pubsub = self._listener = None
+
+    async def connect(self, user_id: int, websocket: WebSocket) -> int | None:
+        """
+        Зареєструвати сокет. Повертає код закриття, якщо ліміт з'єднань вичерпано.
+        Увага: accept() виконується в ендпоїнті ДО виклику connect()
+        """
+        if self.connections >= WS_MAX_CONNECTIONS:
+            self.counters["rejected"] += 1
+            return CLOSE_TRY_AGAIN
+        if len(self.active.get(user_id, [])) >= WS_MAX_PER_USER:
+            self.counters["rejected"] += 1
+            return CLOSE_USER_LIMIT
+
+        writers = self.active.setdefault(user_id, [])
+        writers.append(SocketWriter(self, user_id, websocket))
+        self.connections += 1
+        if len(writers) == 1:
+            await self._subscribe(user_id)
+        return None
+
+    async def disconnect(self, user_id: int, websocket: WebSocket, code: int | None = None):
+        """Прибрати сокет. code — закрити його з боку сервера (повільний або мертвий клієнт)."""
+        writers = self.active.get(user_id, [])
+        writer = next((w for w in writers if w.websocket is websocket), None)
+        if writer is None:
+            return
+
+        writers.remove(writer)
+        self.connections -= 1
+        writer.stop(code)
+        if not writers:
+            del self.active[user_id]
+            await self._unsubscribe(user_id)
+
+    def ping(self, user_id: int, websocket: WebSocket):
+        """Поставити heartbeat у чергу сокета."""
+        writer = next((w for w in self.active.get(user_id, []) if w.websocket is websocket), None)
+        if writer is not None:
+            writer.push(PING_MESSAGE)
+
+    async def listen(self, user_id: int, websocket: WebSocket):
+        """
+        Читати повідомлення клієнта, поки він не відключиться (WebSocketDisconnect летить далі).
+        Після WS_PING_INTERVAL тиші — ping; сокет, що мовчить довше WS_IDLE_TIMEOUT, закривається і метод повертається.
+        """
+        last_seen = time.monotonic()
+        while True:
+            # Будь-яке повідомлення клієнта (зокрема pong) — ознака живого з'єднання
+            try:
+                await asyncio.wait_for(websocket.receive_text(), WS_PING_INTERVAL)
+                last_seen = time.monotonic()
+            except asyncio.TimeoutError:
+                if time.monotonic() - last_seen > WS_IDLE_TIMEOUT:
+                    await self.reap(user_id, websocket)
+                    return
+                self.ping(user_id, websocket)
+
+    async def reap(self, user_id: int, websocket: WebSocket):
+        """Закрити сокет, від якого давно нічого не приходило (напіввідкрите з'єднання)."""
+        self.counters["reaped"] += 1
+        await self.disconnect(user_id, websocket, code=CLOSE_IDLE)
+
+    def stats(self) -> dict:
+        """Гейджі для /metrics (в межах воркера)."""
+        return {
+            "connections": self.connections,
+            "users": len(self.active),
+            "queued": sum(w.queue.qsize() for writers in self.active.values() for w in writers),
+            **self.counters,
+        }
 
     async def broadcast_to_user(self, user_id: int, message: dict):
-        """Надсилає повідомлення всім відкритим вкладкам юзера."""
-        connections = self.active.get(user_id, [])
-        dead: list[WebSocket] = []
+        """Надсилає повідомлення всім відкритим вкладкам юзера (в усіх воркерах)."""
+        data = json.dumps(message)  # Серіалізуємо один раз на подію
 
-        for ws in connections:
+        if self._redis is not None:
             try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                dead.append(ws)
+                await self._redis.publish(f"{CHANNEL_PREFIX}{user_id}", data)
+                return
+            except RedisError as e:
+                # Брокер недоступний — хоча б локальні вкладки отримають подію
+                logger.warning(f"WS | Publish for user {user_id} failed: {e}")
+
+        await self._deliver(user_id, data)
+
+    async def _deliver(self, user_id: int, data: str):
+        """Поставити вже серіалізоване повідомлення в черги локальних сокетів юзера (без очікування мережі)."""
+        slow = [w for w in self.active.get(user_id, []) if not w.push(data)]
+
+        for writer in slow:
+            logger.info(f"WS | User {user_id} socket is too slow, disconnecting")
+            self.counters["slow"] += 1
+            await self.disconnect(user_id, writer.websocket, code=1013)
+
+    async def _subscribe(self, user_id: int):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.subscribe(f"{CHANNEL_PREFIX}{user_id}")
+        except RedisError as e:
+            logger.warning(f"WS | Subscribe for user {user_id} failed: {e}")
+
+    async def _unsubscribe(self, user_id: int):
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(f"{CHANNEL_PREFIX}{user_id}")
+        except RedisError as e:
+            logger.warning(f"WS | Unsubscribe for user {user_id} failed: {e}")
+
+    async def _listen(self):
+        """Читає pub/sub і роздає повідомлення локальним сокетам."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except RedisError as e:
+                # Клієнт перепідключається і відновлює підписки сам при наступному читанні
+                logger.warning(f"WS | Broker connection lost: {e}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if message is None or message["type"] != "message":
+                continue
 
-        for ws in dead:
-            self.disconnect(user_id, ws)
+            channel = message["channel"]
+            if not channel.startswith(CHANNEL_PREFIX):
+                continue
+            await self._deliver(int(channel[len(CHANNEL_PREFIX):]), message["data"])
@@ -0,0 +1,67 @@
+# region Імпорти
+import os
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Movie, MovieChange, User
+# endregion
+
+# Скільки останніх змін юзера тримати в журналі (старіший since → повне перезавантаження)
+CHANGES_KEEP = int(os.getenv("CHANGES_KEEP", "1000"))
+
+
+async def record_changes(db: AsyncSession, user_id: int, movie_ids: list[int]) -> tuple[int, int]:
+    """
+    Видати номери змін для movie_ids і записати їх у журнал.
+    Викликати в транзакції запису (до коміту) — тоді зміна і її номер видимі атомарно.
+    Повертає (prev_seq, seq): номер до цих змін і номер останньої з них.
+    change_seq не входить у кешований знімок юзера — invalidate_principal тут не потрібен.
+    """
+    count = len(movie_ids)
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(change_seq=User.change_seq + count)
+        .returning(User.change_seq)
+    )
+    seq = (await db.execute(stmt)).scalar_one()
+    prev_seq = seq - count
+
+    if movie_ids:
+        await db.execute(insert(MovieChange), [
+            {"user_id": user_id, "seq": prev_seq + i, "movie_id": movie_id}
+            for i, movie_id in enumerate(movie_ids, start=1)
+        ])
+        # Обрізаємо журнал — range delete по PK (user_id, seq)
+        await db.execute(delete(MovieChange).where(
+            MovieChange.user_id == user_id,
+            MovieChange.seq <= seq - CHANGES_KEEP
+        ))
+    return prev_seq, seq
+
+
+async def get_change_seq(db: AsyncSession, user_id: int) -> int:
+    return (await db.execute(select(User.change_seq).where(User.id == user_id))).scalar_one()
+
+
+async def get_changes(db: AsyncSession, user_id: int, since: int) -> dict:
+    """Актуальні версії фільмів, змінених після since, і id видалених."""
+    seq = await get_change_seq(db, user_id)
+    if since == seq:
+        return {"seq": seq}
+    if since > seq or since < seq - CHANGES_KEEP:
+        return {"seq": seq, "reset": True}
+
+    changed = (
+        select(MovieChange.movie_id)
+        .where(MovieChange.user_id == user_id, MovieChange.seq > since)
+        .distinct()
+    )
+    changed_ids = set((await db.execute(changed)).scalars().all())
+
+    stmt = select(Movie).where(Movie.user_id == user_id, Movie.id.in_(changed_ids)).order_by(Movie.id)
+    movies = (await db.execute(stmt)).scalars().all()
+
+    # Змінений фільм, якого вже немає в таблиці, — видалений
+    deleted = changed_ids - {movie.id for movie in movies}
+    return {"seq": seq, "movies": movies, "deleted": sorted(deleted)}
@@ -1,18 +1,133 @@
 # region Імпорти
+from fastapi import Request
+from jose import jwt, JWTError
+from redis.exceptions import RedisError
+from sqlalchemy import make_url, text
+from sqlalchemy.exc import InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.logger import setup_logger
+from app.core.redis_client import get_redis
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 # endregion
 
-db_logger = setup_logger() 
+db_logger = setup_logger("database")
 load_dotenv() # Загружаєм змінні з .env
 section = 'DATABASE' # Для зрозумілості звідки логи
 
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
 # Дістаєм ссилку на БД + не забуваєм про дефолт, щоб "create_async_engine" не возмущався
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://localhost/default_db")
-engine = create_async_engine(DATABASE_URL, future=True, echo=True) # З'єднуємося з БД
+
+# Налаштування пулу (підбираються під кількість воркерів: size * workers <= max_connections)
+DB_ECHO = _env_bool("DB_ECHO", "false")  # Лог кожного SQL — тільки для дебагу
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "true")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# PgBouncer у transaction mode не підтримує іменовані prepared statements між транзакціями
+DB_PGBOUNCER = _env_bool("DB_PGBOUNCER", "false")
+
+
+class PoolMetrics:
+    """Час очікування з'єднання з пулу та заповненість пулу (для /metrics)."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.errors = 0
+
+    def observe(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self, pool) -> dict:
+        capacity = pool.size() + DB_MAX_OVERFLOW
+        checked_out = pool.checkedout()
+        return {
+            "size": pool.size(),
+            "checked_out": checked_out,
+            "overflow": max(pool.overflow(), 0),
+            "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "errors": self.errors,
+            "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+        }
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """Пул, що міряє скільки чекали на вільне з'єднання."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.errors += 1
+            raise
+        self.metrics.observe(time.perf_counter() - start)
+        return connection
+
+
+def create_engine_from_env(url: str):
+    """AsyncEngine з налаштуваннями пулу з env."""
+    url_obj = make_url(url)
+    connect_args = {}
+
+    if url_obj.get_backend_name() == "postgresql" and url_obj.get_driver_name() == "asyncpg":
+        if DB_PGBOUNCER:
+            # Без кешу prepared statements і з унікальними іменами — сумісно з PgBouncer
+            url_obj = url_obj.update_query_dict({"prepared_statement_cache_size": "0"})
+            connect_args = {
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+            }
+        else:
+            connect_args = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+
+    # Окремий підклас на кожен engine: метрики переживають pool.recreate() при dispose()
+    pool_class = type("MeteredPool", (MeteredPool,), {"metrics": PoolMetrics()})
+    return create_async_engine(
+        url_obj,
+        echo=DB_ECHO,
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+# Read-replica (опціонально). Без DATABASE_REPLICA_URL всі читання йдуть на primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+# Скільки секунд після запису читання юзера йдуть на primary (read-your-writes)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+# Максимальне відставання репліки (сек) і як часто його перевіряти
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.sync_engine.pool
+    return pool.metrics.snapshot(pool)
+
+
+engine = create_engine_from_env(DATABASE_URL) # З'єднуємося з БД
 async_session = async_sessionmaker(engine, # Фабрика сесій (Кожен запит отримує свою)
     class_=AsyncSession, 
     expire_on_commit=False, 
@@ -20,6 +135,105 @@ async_session = async_sessionmaker(engine, # Фабрика сесій (Коже
     autoflush=False
 )
 
+replica_engine = create_engine_from_env(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+replica_session = async_sessionmaker(replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False
+) if replica_engine else None
+
+
+class ReplicaHealth:
+    """Кешований (на REPLICA_CHECK_INTERVAL) стан репліки: доступна і не відстає."""
+
+    def __init__(self):
+        self.healthy = True
+        self.lag = 0.0
+        self.checked_at = 0.0
+
+    def mark_down(self) -> None:
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+    async def is_usable(self) -> bool:
+        if replica_engine is None:
+            return False
+        if time.monotonic() - self.checked_at < REPLICA_CHECK_INTERVAL:
+            return self.healthy
+
+        # Ставимо час одразу — щоб паралельні запити не перевіряли одночасно
+        self.checked_at = time.monotonic()
+        try:
+            async with replica_engine.connect() as conn:
+                # Якщо все отримане вже застосовано — відставання немає (навіть коли primary простоює)
+                lag = await conn.scalar(text("""
+                    SELECT CASE
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                    END
+                """))
+            self.lag = float(lag or 0)
+            self.healthy = self.lag <= REPLICA_MAX_LAG
+        except Exception as e:
+            db_logger.warning(f"{section} | Replica is unavailable, reads fall back to primary: {e}")
+            self.healthy = False
+            return False
+
+        if not self.healthy:
+            db_logger.warning(f"{section} | Replica lags {self.lag:.1f}s, reads fall back to primary")
+        return self.healthy
+
+
+replica_health = ReplicaHealth()
+# { subject: до якого часу читати з primary } — локальна копія Redis-ключів db:pin:*
+_primary_pins: dict[str, float] = {}
+
+
+async def pin_to_primary(subject: str | None) -> None:
+    """Після запису — читання цього юзера йдуть на primary READ_YOUR_WRITES_SECONDS секунд."""
+    if not subject or replica_engine is None:
+        return
+
+    _primary_pins[subject] = time.monotonic() + READ_YOUR_WRITES_SECONDS
+    try:
+        await get_redis().set(f"db:pin:{subject}", 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+    except RedisError:
+        pass
+
+
+async def _is_pinned(subject: str | None) -> bool:
+    if not subject:
+        return False
+
+    expires_at = _primary_pins.get(subject)
+    if expires_at is not None:
+        if expires_at > time.monotonic():
+            return True
+        del _primary_pins[subject]
+
+    # Запис міг бути на іншому воркері
+    try:
+        return bool(await get_redis().exists(f"db:pin:{subject}"))
+    except RedisError:
+        return True  # Не знаємо — безпечніше читати з primary
+
+
+def _request_subject(request: Request) -> str | None:
+    """
+    "sub" з JWT запиту — тільки для вибору БД, без перевірки підпису
+    (автентифікацію все одно робить get_current_user).
+    """
+    auth = request.headers.get("authorization", "")
+    token = auth[7:] if auth.lower().startswith("bearer ") else request.query_params.get("token")
+    if not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("sub")
+    except JWTError:
+        return None
+
+
 # Отримуємо БД сессію (Щоб не смітити мейн код, забути про закриття сесії)
 async def get_db():
     db_logger.debug("Creating async database session")
@@ -39,15 +253,44 @@ async def get_db():
         finally:
 
             await session.close() # Закриваєм сесію
-            db_logger.debug(f"{section} | Closed async database session")
+            db_logger.debug("%s | Closed async database session", section)
+
+# Сесія тільки для читання: репліка, якщо вона жива, не відстає і юзер нещодавно не писав
+async def get_read_db(request: Request):
+    use_replica = (
+        replica_session is not None
+        and not await _is_pinned(_request_subject(request))
+        and await replica_health.is_usable()
+    )
+    factory = replica_session if use_replica else async_session
+
+    async with factory() as session: # type: ignore
+        try:
+
+            yield session # Віддаєм сесію (без коміту — тільки читання)
+
+        except (OperationalError, InterfaceError, OSError) as e:
+
+            if use_replica:
+                replica_health.mark_down() # Наступні запити підуть на primary
+            db_logger.error(f"{section} | Read database error: {e}")
+            raise e
+
+        finally:
+
+            await session.close()
+
+# Ініціалізація БД: тільки перевірка версії схеми (без create_all і рефлексії)
+# DB_AUTO_MIGRATE=true — застосувати міграції на старті (зручно для локальної розробки)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
 
-# Ініціалізація БД
 async def init_db():
-    from . import models # Щоб Base мала метадані і розуміла яку таблицю створювати
+    from .migrations import check_schema, upgrade
 
-    db_logger.info(f"{section} | Creating database tables")
-    # Створення таблиці (Обов'язоково має бути модель класу у файлі (або імпорт))
-    async with engine.begin() as conn:
-        await conn.run_sync(models.Base.metadata.create_all)
+    if DB_AUTO_MIGRATE:
+        version = await upgrade(engine)
+        db_logger.info(f"{section} | Migrations applied, schema version {version}")
+        return
 
-    db_logger.info(f"{section} | Database tables created")
\ No newline at end of file
+    version = await check_schema(engine)
+    db_logger.info(f"{section} | Schema version {version} is up to date")
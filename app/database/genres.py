@@ -0,0 +1,81 @@
+# region Імпорти
+import os
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Genre, MovieGenre
+# endregion
+
+# Скільки жанрів одного фільму потрапляє в довідник (решта лишається лише в тексті Movie.genre)
+MAX_GENRES_PER_MOVIE = int(os.getenv("MAX_GENRES_PER_MOVIE", "10"))
+# Рядків в одному INSERT / IN: asyncpg приймає максимум 32767 параметрів на запит (зв'язок — 2 параметри)
+GENRE_CHUNK = 5000
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def split_genres(genre_text: str | None) -> list[str]:
+    """'Драма, Комедія' → ['Драма', 'Комедія'] (без дублів і порожніх, не більше MAX_GENRES_PER_MOVIE)."""
+    names: list[str] = []
+    for name in (genre_text or "").split(","):
+        name = name.strip()[:100]
+        if name and name not in names:
+            names.append(name)
+            if len(names) == MAX_GENRES_PER_MOVIE:
+                break
+    return names
+
+
+async def ensure_genres(db: AsyncSession, names: set[str]) -> dict[str, int]:
+    """Створити відсутні жанри і повернути { назва: id } (пачками по GENRE_CHUNK)."""
+    genre_ids: dict[str, int] = {}
+    for chunk in _chunks(sorted(names), GENRE_CHUNK):
+        stmt = pg_insert(Genre).values([{"name": name} for name in chunk]).on_conflict_do_nothing(index_elements=["name"])
+        await db.execute(stmt)
+
+        result = await db.execute(select(Genre.name, Genre.id).where(Genre.name.in_(chunk)))
+        genre_ids.update(result.tuples().all())
+    return genre_ids
+
+
+async def upsert_tmdb_genres(db: AsyncSession, genre_map: dict[str, str]) -> None:
+    """Записати список жанрів TMDB { "28": "Бойовик", ... } у довідник."""
+    if not genre_map:
+        return
+
+    stmt = pg_insert(Genre).values([
+        {"name": name[:100], "tmdb_id": int(tmdb_id)} for tmdb_id, name in genre_map.items()
+    ])
+    stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"tmdb_id": stmt.excluded.tmdb_id})
+    await db.execute(stmt)
+
+
+async def sync_movie_genres(db: AsyncSession, movies: list[tuple[int, str | None]], replace: bool = False) -> None:
+    """
+    Заповнити movie_genres для [(movie_id, genre_text), ...].
+    replace=True — спочатку прибрати старі зв'язки (при зміні жанру фільму).
+    Коміт — на стороні того, хто викликає.
+    """
+    if not movies:
+        return
+
+    if replace:
+        await db.execute(delete(MovieGenre).where(MovieGenre.movie_id.in_([movie_id for movie_id, _ in movies])))
+
+    parsed = [(movie_id, split_genres(text)) for movie_id, text in movies]
+    genre_ids = await ensure_genres(db, {name for _, names in parsed for name in names})
+
+    rows = [
+        {"movie_id": movie_id, "genre_id": genre_ids[name]}
+        for movie_id, names in parsed for name in names if name in genre_ids
+    ]
+    for chunk in _chunks(rows, GENRE_CHUNK):
+        await db.execute(pg_insert(MovieGenre).values(chunk).on_conflict_do_nothing())
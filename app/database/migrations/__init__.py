@@ -0,0 +1,129 @@
+"""Міграції схеми БД
+
+Версійовані міграції замість create_all на старті.
+Кожна міграція — модуль versions/vNNNN_<назва>.py з:
+    revision: int        — номер версії (послідовний)
+    transactional: bool  — False для DDL, що не працює в транзакції (CREATE INDEX CONCURRENTLY)
+    async def upgrade(conn: AsyncConnection) -> None
+
+Поточна версія зберігається в таблиці schema_version (один рядок).
+Запуск: python -m app.database.migrations upgrade
+"""
+
+# region Імпорти
+import importlib
+import logging
+import pkgutil
+from types import ModuleType
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from . import versions
+# endregion
+
+VERSION_TABLE = "schema_version"
+# Ключ advisory lock — щоб кілька воркерів не мігрували одночасно
+MIGRATION_LOCK_KEY = 74_2001
+
+logger = logging.getLogger("watchlist.migrations")
+
+
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+
+def discover() -> list[ModuleType]:
+    """Всі міграції з versions/, відсортовані по revision."""
+    modules = [
+        importlib.import_module(f"{versions.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(versions.__path__)
+        if info.name.startswith("v")
+    ]
+    modules.sort(key=lambda module: module.revision)
+
+    revisions = [module.revision for module in modules]
+    if revisions != list(range(1, len(revisions) + 1)):
+        raise RuntimeError(f"Migration revisions must be sequential from 1, got {revisions}")
+    return modules
+
+
+def head() -> int:
+    return len(discover())
+
+
+async def get_version(conn: AsyncConnection) -> int:
+    """Поточна версія схеми (0 — міграції ще не запускались)."""
+    if await conn.scalar(text(f"SELECT to_regclass('{VERSION_TABLE}')")) is None:
+        return 0
+    return await conn.scalar(text(f"SELECT version FROM {VERSION_TABLE}")) or 0
+
+
+async def _set_version(conn: AsyncConnection, revision: int) -> None:
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (version INTEGER NOT NULL)"))
+    updated = await conn.execute(text(f"UPDATE {VERSION_TABLE} SET version = :v"), {"v": revision})
+    if updated.rowcount == 0:
+        await conn.execute(text(f"INSERT INTO {VERSION_TABLE} (version) VALUES (:v)"), {"v": revision})
+
+
+async def upgrade(engine: AsyncEngine, target: int | None = None) -> int:
+    """Застосувати міграції до target (за замовчуванням — до останньої). Повертає нову версію."""
+    migrations = discover()
+    target = len(migrations) if target is None else target
+
+    async with engine.connect() as lock_conn:
+        await lock_conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            await lock_conn.commit()
+            version = await get_version(lock_conn)
+            await lock_conn.commit()
+
+            for migration in migrations[version:target]:
+                logger.info(f"MIGRATIONS | Applying {migration.__name__.rsplit('.', 1)[-1]}")
+
+                if getattr(migration, "transactional", True):
+                    async with engine.begin() as conn:
+                        await migration.upgrade(conn)
+                        await _set_version(conn, migration.revision)
+                else:
+                    # CONCURRENTLY не можна в транзакції — кожен statement комітиться окремо
+                    async with engine.connect() as conn:
+                        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                        await migration.upgrade(conn)
+                        await _set_version(conn, migration.revision)
+
+                version = migration.revision
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            await lock_conn.commit()
+
+    return version
+
+
+async def check_schema(engine: AsyncEngine) -> int:
+    """Перевірка на старті: версія в БД має дорівнювати останній міграції."""
+    async with engine.connect() as conn:
+        version = await get_version(conn)
+
+    expected = head()
+    if version != expected:
+        raise SchemaOutdatedError(
+            f"Database schema is at version {version}, expected {expected}. "
+            f"Run: python -m app.database.migrations upgrade"
+        )
+    return version
+
+
+async def create_index_concurrently(conn: AsyncConnection, name: str, ddl: str) -> None:
+    """
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS з прибиранням INVALID індексу,
+    що міг лишитись після перерваної попередньої спроби.
+    ddl — все після "CREATE INDEX CONCURRENTLY IF NOT EXISTS <name>".
+    """
+    invalid = await conn.scalar(text(
+        "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name})
+    if invalid:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+    await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {ddl}"))
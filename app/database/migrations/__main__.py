@@ -0,0 +1,27 @@
+# python -m app.database.migrations [upgrade [<revision>] | current]
+import asyncio
+import sys
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database.database import engine
+from app.database.migrations import get_version, head, upgrade
+
+
+async def main(args: list[str], engine: AsyncEngine) -> None:
+    command = args[0] if args else "upgrade"
+
+    if command == "current":
+        async with engine.connect() as conn:
+            print(f"Current: {await get_version(conn)}, head: {head()}")
+    elif command == "upgrade":
+        target = int(args[1]) if len(args) > 1 else None
+        print(f"Upgraded to version {await upgrade(engine, target)}")
+    else:
+        raise SystemExit(f"Unknown command: {command}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:], engine))
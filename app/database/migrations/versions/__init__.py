@@ -0,0 +1 @@
+# Файли міграцій: vNNNN_<назва>.py
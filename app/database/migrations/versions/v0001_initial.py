@@ -0,0 +1,53 @@
+"""Початкова схема: users, movies (як її створював create_all).
+
+IF NOT EXISTS — щоб міграція лягла і на БД, створені раніше через create_all.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+revision = 1
+transactional = True
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("""
+        DO $$ BEGIN
+            CREATE TYPE moviestatus AS ENUM ('want_to_watch', 'watching', 'watched');
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$
+    """))
+
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            username VARCHAR(100) NOT NULL UNIQUE,
+            hashed_password VARCHAR(255) NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_active BOOLEAN NOT NULL
+        )
+    """))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)"))
+
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS movies (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            id SERIAL PRIMARY KEY,
+            tmdb_id INTEGER,
+            title VARCHAR(255) NOT NULL,
+            original_title VARCHAR(255),
+            year INTEGER NOT NULL,
+            genre VARCHAR(200) NOT NULL,
+            poster_url VARCHAR(500),
+            overview TEXT,
+            runtime INTEGER,
+            status moviestatus NOT NULL,
+            user_rating FLOAT,
+            notes TEXT,
+            watch_date TIMESTAMP WITHOUT TIME ZONE,
+            added_date TIMESTAMP WITHOUT TIME ZONE,
+            updated_date TIMESTAMP WITHOUT TIME ZONE
+        )
+    """))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_movies_id ON movies (id)"))
@@ -0,0 +1,44 @@
+"""Нормалізовані жанри: genres, movie_genres + backfill з тексту Movie.genre."""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+revision = 2
+transactional = True
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS genres (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL UNIQUE,
+            tmdb_id INTEGER UNIQUE
+        )
+    """))
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS movie_genres (
+            movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+            genre_id INTEGER NOT NULL REFERENCES genres (id) ON DELETE CASCADE,
+            PRIMARY KEY (movie_id, genre_id)
+        )
+    """))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_movie_genres_genre_movie ON movie_genres (genre_id, movie_id)"
+    ))
+
+    # Backfill одним set-based запитом: 'Драма, Комедія' → рядки movie_genres
+    await conn.execute(text("""
+        INSERT INTO genres (name)
+        SELECT DISTINCT left(btrim(g), 100)
+        FROM movies, unnest(string_to_array(genre, ',')) AS g
+        WHERE btrim(g) <> ''
+        ON CONFLICT (name) DO NOTHING
+    """))
+    await conn.execute(text("""
+        INSERT INTO movie_genres (movie_id, genre_id)
+        SELECT DISTINCT m.id, gn.id
+        FROM movies m
+        CROSS JOIN unnest(string_to_array(m.genre, ',')) AS g
+        JOIN genres gn ON gn.name = left(btrim(g), 100)
+        ON CONFLICT DO NOTHING
+    """))
@@ -0,0 +1,34 @@
+"""Індекси Movie (пагінація, фільтри, статистика, trigram пошук) — без блокування таблиці."""
+
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database.migrations import create_index_concurrently
+
+revision = 3
+transactional = False
+
+INDEXES = {
+    "ix_movies_user_added": "ON movies (user_id, added_date, id)",
+    "ix_movies_user_year": "ON movies (user_id, year, id)",
+    "ix_movies_user_rating": "ON movies (user_id, user_rating, id)",
+    "ix_movies_user_title": "ON movies (user_id, title, id)",
+    "ix_movies_user_status": "ON movies (user_id, status)",
+    "ix_movies_user_watch_date": "ON movies (user_id, watch_date)",
+}
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    for name, ddl in INDEXES.items():
+        await create_index_concurrently(conn, name, ddl)
+
+    # pg_trgm є не в усіх збірках Postgres — без нього пошук по назві працює, просто без індексу
+    available = await conn.scalar(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+    if not available:
+        logging.getLogger("watchlist.migrations").warning("MIGRATIONS | pg_trgm is not available, skipping ix_movies_title_trgm")
+        return
+
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    await create_index_concurrently(conn, "ix_movies_title_trgm", "ON movies USING gin (title gin_trgm_ops)")
@@ -0,0 +1,22 @@
+"""Delta sync: users.change_seq + журнал змін movie_changes."""
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+revision = 4
+transactional = True
+
+
+async def upgrade(conn: AsyncConnection) -> None:
+    # Константний DEFAULT — без переписування таблиці (PostgreSQL 11+)
+    await conn.execute(text(
+        "ALTER TABLE users ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0"
+    ))
+    await conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS movie_changes (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            seq BIGINT NOT NULL,
+            movie_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, seq)
+        )
+    """))
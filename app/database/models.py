@@ -1,7 +1,7 @@
 # region Модулі для БД
 from sqlalchemy.orm import DeclarativeBase, relationship
-from sqlalchemy import Boolean, DateTime, Integer, String, Text, Enum, Float
-from sqlalchemy import ForeignKey
+from sqlalchemy import BigInteger, Boolean, DateTime, Integer, String, Text, Enum, Float
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 # endregion
 
@@ -27,6 +27,8 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Номер останньої зміни в списку фільмів юзера (delta sync, див. movie_changes)
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0", nullable=False)
 
 
 class MovieStatus(str, enum.Enum):
@@ -58,7 +60,52 @@ class Movie(Base):
     watch_date: Mapped[DateTime | None] = mapped_column(DateTime)
     added_date: Mapped[DateTime | None] = mapped_column(DateTime, default=datetime.now)
     updated_date: Mapped[DateTime | None] = mapped_column(DateTime, onupdate=datetime.now)
-    
 
+    __table_args__ = (
+        # Індекси під keyset пагінацію: (user_id, ключ сортування, id)
+        # ix_movies_user_year також покриває фільтр по (user_id, year)
+        Index("ix_movies_user_added", "user_id", "added_date", "id"),
+        Index("ix_movies_user_year", "user_id", "year", "id"),
+        Index("ix_movies_user_rating", "user_id", "user_rating", "id"),
+        Index("ix_movies_user_title", "user_id", "title", "id"),
+        # Фільтр по статусу і статистика (GROUP BY status, місяці переглядів)
+        Index("ix_movies_user_status", "user_id", "status"),
+        Index("ix_movies_user_watch_date", "user_id", "watch_date"),
+        # Пошук по назві (ILIKE '%...%') — trigram GIN, потребує розширення pg_trgm
+        Index("ix_movies_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+    )
+
+
+# Довідник жанрів (назви з TMDB; tmdb_id — якщо жанр прийшов зі списку TMDB)
+class Genre(Base):
+
+    __tablename__ = "genres"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    tmdb_id: Mapped[int | None] = mapped_column(Integer, unique=True, nullable=True)
+
+
+# Зв'язок Many-to-Many між Movie і Genre (Movie.genre лишається як текст для відображення)
+class MovieGenre(Base):
+
+    __tablename__ = "movie_genres"
+
+    movie_id: Mapped[int] = mapped_column(Integer, ForeignKey("movies.id", ondelete="CASCADE"), primary_key=True)
+    genre_id: Mapped[int] = mapped_column(Integer, ForeignKey("genres.id", ondelete="CASCADE"), primary_key=True)
+
+    # PK (movie_id, genre_id) покриває пошук по фільму, цей індекс — фільтр по жанру
+    __table_args__ = (
+        Index("ix_movie_genres_genre_movie", "genre_id", "movie_id"),
+    )
+
+
+# Журнал змін фільмів юзера: seq — монотонний номер у межах юзера (users.change_seq)
+class MovieChange(Base):
+
+    __tablename__ = "movie_changes"
 
-     
\ No newline at end of file
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    seq: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    # Без FK — запис має пережити видалення фільму
+    movie_id: Mapped[int] = mapped_column(Integer, nullable=False)
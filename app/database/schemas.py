@@ -91,4 +91,11 @@ class MonthlyHistory(BaseModel):
 class StatsResponse(BaseModel):
     by_status: dict[str, int]
     top_genres: list[GenreCount]
-    monthly_history: list[MonthlyHistory]
\ No newline at end of file
+    monthly_history: list[MonthlyHistory]
+
+# Відповідь delta sync: reset=True — журнал не покриває since, потрібне повне перезавантаження
+class ChangesResponse(BaseModel):
+    seq: int
+    reset: bool = False
+    movies: list[MovieResponse] = []
+    deleted: list[int] = []
@@ -0,0 +1,259 @@
+"""Watchlist Import Service
+
+Потоковий імпорт експортів (CSV з Letterboxd / IMDb, JSON / NDJSON) у таблицю Movie.
+Файл читається рядок за рядком і пишеться пачками — пам'ять не залежить від розміру файлу.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import re
+from itertools import islice
+from typing import IO, Iterator
+
+import httpx
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.core.mytools import bulk_insert_movies, with_watch_date
+from app.core.rate_limit import TMDB_IMPORT_LIMIT, wait_rate_limit
+from app.core.redis_client import get_redis
+from app.core.ws_manager import ConnectionManager
+from app.database.changes import record_changes
+from app.database.models import MovieStatus
+from app.database.schemas import MovieCreate
+from app.services.stats import apply_movie_delta
+from app.services.tmdb import TMDBService
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_ENRICH_CONCURRENCY = int(os.getenv("IMPORT_ENRICH_CONCURRENCY", "5"))
+# Скільки разів повторювати пошук рядка після 429 (спільний ліміт tmdb_upstream або сам TMDB)
+IMPORT_ENRICH_RETRIES = int(os.getenv("IMPORT_ENRICH_RETRIES", "5"))
+READ_CHUNK_SIZE = 64 * 1024
+# Найбільший JSON-об'єкт (у символах), який імпорт готовий тримати в буфері
+IMPORT_MAX_ROW_SIZE = int(os.getenv("IMPORT_MAX_ROW_SIZE", str(1024 * 1024)))
+
+# Роздільники верхнього рівня між об'єктами: пробіли, коми, дужки масиву
+_SEPARATORS = re.compile(r"[\s,\[\]]*")
+
+logger = logging.getLogger("watchlist.importer")
+
+# Назви колонок в експортах (lowercase) → поля MovieCreate
+COLUMN_ALIASES = {
+    "title": ("title", "name"),
+    "year": ("year",),
+    "genre": ("genre", "genres"),
+    "status": ("status",),
+    "tmdb_id": ("tmdb_id", "tmdbid"),
+    "original_title": ("original_title", "original title"),
+    "poster_url": ("poster_url",),
+    "overview": ("overview",),
+}
+
+
+def detect_format(filename: str | None) -> str | None:
+    """Визначити формат по розширенню файлу."""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".json", ".ndjson", ".jsonl")):
+        return "json"
+    return None
+
+
+class ImportFormatError(ValueError):
+    """Файл не можна імпортувати потоково: обгортка замість масиву або завеликий запис."""
+
+
+def iter_csv_rows(text: IO[str]) -> Iterator[dict]:
+    yield from csv.DictReader(text)
+
+
+def _is_wrapper(obj: dict) -> bool:
+    """{"movies": [{...}, ...]} — об'єкт-обгортка зі списком фільмів, а не сам фільм."""
+    return any(isinstance(value, list) and value and isinstance(value[0], dict) for value in obj.values())
+
+
+def iter_json_rows(text: IO[str]) -> Iterator[dict]:
+    """
+    Потоковий розбір JSON масиву об'єктів або NDJSON.
+    Позиція рухається по буферу без копіювання; прочитане відрізається раз на READ_CHUNK_SIZE.
+    Недочитаний об'єкт перепарсюється після кожного шматка, тому його розмір обмежений
+    IMPORT_MAX_ROW_SIZE — інакше ImportFormatError (так само для обгортки {"movies": [...]}).
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos >= READ_CHUNK_SIZE:
+            buffer, pos = buffer[pos:], 0
+
+        if pos == len(buffer):
+            if eof:
+                return
+            chunk = text.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            if len(buffer) - pos > IMPORT_MAX_ROW_SIZE:
+                raise ImportFormatError(
+                    f"JSON value is malformed or larger than {IMPORT_MAX_ROW_SIZE} characters "
+                    "(expected an array of movies or NDJSON)"
+                )
+            # Об'єкт обрізаний кінцем шматка — дочитуємо
+            chunk = text.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        pos = end
+        if isinstance(obj, dict):
+            if _is_wrapper(obj):
+                raise ImportFormatError("Wrapped JSON is not supported (expected an array of movies or NDJSON)")
+            yield obj
+
+
+def map_row(row: dict, default_status: MovieStatus) -> dict:
+    """Привести рядок експорту до полів MovieCreate."""
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    data = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ""):
+                data[field] = value.strip() if isinstance(value, str) else value
+                break
+
+    if data.get("status") not in MovieStatus.__members__:
+        data["status"] = default_status
+    return data
+
+
+def retry_after(error: Exception) -> float | None:
+    """Секунди з Retry-After, якщо помилка — 429 (наш ліміт або відповідь TMDB); інакше None."""
+    if isinstance(error, HTTPException) and error.status_code == 429:
+        headers = error.headers or {}
+    elif isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429:
+        headers = error.response.headers
+    else:
+        return None
+
+    try:
+        return max(float(headers.get("Retry-After", "1")), 0.0)
+    except ValueError:
+        return 1.0
+
+
+async def enrich_row(
+        data: dict,
+        tmdb: TMDBService | None,
+        semaphore: asyncio.Semaphore,
+        user_id: int,
+    ) -> bool:
+    """
+    Дозаповнити відсутні поля (жанр, рік, tmdb_id...) з першого збігу в TMDB.
+    Кожен пошук списується з відра юзера tmdb_import (чекаємо на токен), на 429 — чекаємо Retry-After.
+    Повертає False, якщо пошук так і не вдався (рядок піде в БД без дозаповнення).
+    """
+    if tmdb is None or not data.get("title"):
+        return True
+    if data.get("genre") and data.get("year") and data.get("tmdb_id"):
+        return True
+
+    async with semaphore:
+        for attempt in range(IMPORT_ENRICH_RETRIES + 1):
+            await wait_rate_limit("tmdb_import", str(user_id), TMDB_IMPORT_LIMIT)
+            try:
+                results = await tmdb.search_and_format(str(data["title"]), 1)
+                break
+            except Exception as e:
+                delay = retry_after(e)
+                if delay is None or attempt == IMPORT_ENRICH_RETRIES:
+                    logger.warning(f"IMPORT | TMDB lookup for {data['title']!r} failed: {e!r}")
+                    return False
+                await asyncio.sleep(delay)
+
+    year = str(data.get("year") or "")
+    match = next((r for r in results if year and str(r.get("year")) == year), None)
+    if match is None and results:
+        match = results[0]
+    if match is None:
+        return True
+
+    for field in ("tmdb_id", "year", "genre", "original_title", "poster_url", "overview"):
+        if not data.get(field) and match.get(field):
+            data[field] = match[field]
+    return True
+
+
+async def import_movies(
+        upload: IO[bytes],
+        fmt: str,
+        db: AsyncSession,
+        user_id: int,
+        manager: ConnectionManager,
+        tmdb: TMDBService | None = None,
+        default_status: MovieStatus = MovieStatus.watched,
+    ) -> dict:
+    """
+    Імпортувати файл пачками по IMPORT_BATCH_SIZE (кожна пачка — окремий коміт).
+    Прогрес надсилається юзеру через WebSocket.
+    """
+    text = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+    rows = iter_csv_rows(text) if fmt == "csv" else iter_json_rows(text)
+    semaphore = asyncio.Semaphore(IMPORT_ENRICH_CONCURRENCY)
+    # unenriched — рядки, для яких пошук у TMDB не вдався (збережені без дозаповнення)
+    progress = {"processed": 0, "inserted": 0, "skipped": 0, "unenriched": 0}
+    seq = None
+
+    try:
+        while True:
+            # Читання/парсинг файлу — блокуюче, тому в threadpool
+            batch = await run_in_threadpool(lambda: list(islice(rows, IMPORT_BATCH_SIZE)))
+            if not batch:
+                break
+
+            mapped = [map_row(row, default_status) for row in batch]
+            enriched = await asyncio.gather(*(enrich_row(data, tmdb, semaphore, user_id) for data in mapped))
+            progress["unenriched"] += enriched.count(False)
+
+            valid = []
+            for data in mapped:
+                data.setdefault("genre", "")
+                try:
+                    movie = MovieCreate(**data)
+                except ValidationError:
+                    progress["skipped"] += 1
+                    continue
+                valid.append(with_watch_date({**movie.model_dump(), "user_id": user_id}))
+
+            if valid:
+                inserted = await bulk_insert_movies(db, valid)
+                _, seq = await record_changes(db, user_id, [movie.id for movie in inserted])
+                await db.commit()
+                await apply_movie_delta(get_redis(), user_id, seq, added=inserted)
+                progress["inserted"] += len(inserted)
+
+            progress["processed"] += len(batch)
+            await manager.broadcast_to_user(user_id, {"event": "import_progress", **progress})
+    finally:
+        # Не закриваємо файл разом з обгорткою — ним керує UploadFile
+        text.detach()
+
+    # Фільми не шлемо (їх може бути багато) — клієнт доганяє через /movies/changes
+    await manager.broadcast_to_user(user_id, {"event": "imported", "seq": seq, **progress})
+    return progress
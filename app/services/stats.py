@@ -0,0 +1,292 @@
+"""User Stats Service
+
+Статистика юзера як агрегат у Redis hash "stats:{user_id}":
+    s:<status>  — кількість фільмів у статусі
+    g:<genre>   — кількість фільмів жанру
+    m:<YYYY-MM> — кількість переглянутих за місяць
+Ендпоїнти запису оновлюють hash інкрементально, читання не залежить від розміру списку.
+Якщо hash немає (TTL, рестарт Redis) — повний перерахунок одним SQL запитом.
+
+Службові поля:
+    _ready — агрегат повний (без нього hash лише тримає _seen)
+    _seq   — users.change_seq знімка, з якого перебудовано агрегат
+    _seen  — найбільший номер змін, що дійшов до агрегату як дельта
+Дельта з seq <= _seq вже врахована в знімку і пропускається. Перебудова зі знімка,
+старішого за _seen, не записується — інакше дельта, що прийшла під час читання, загубилась би.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import Counter
+from typing import Any, Iterable
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy import String, cast, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.changes import get_change_seq
+from app.database.database import async_session
+from app.database.genres import split_genres
+from app.database.models import Genre, Movie, MovieGenre, MovieStatus
+from app.database.schemas import GenreCount, MonthlyHistory, StatsResponse
+
+STATS_TTL = int(os.getenv("STATS_TTL", str(7 * 24 * 3600)))
+READY_FIELD = "_ready"
+SEQ_FIELD = "_seq"
+SEEN_FIELD = "_seen"
+META_FIELDS = (READY_FIELD, SEQ_FIELD, SEEN_FIELD)
+# Скільки разів пробувати перебудову, якщо під час читання з БД прийшли нові зміни
+REBUILD_ATTEMPTS = 2
+
+# ARGV: ttl, seq, потім пари поле/інкремент.
+# _seen оновлюється завжди; інкремент — тільки в повний агрегат і тільки якщо зміна новіша за його знімок
+_APPLY_DELTA_SCRIPT = """
+local seq = tonumber(ARGV[2])
+local seen = tonumber(redis.call("hget", KEYS[1], "_seen") or "0")
+if seq > seen then
+    redis.call("hset", KEYS[1], "_seen", seq)
+end
+if redis.call("hexists", KEYS[1], "_ready") == 0 then
+    redis.call("expire", KEYS[1], ARGV[1])
+    return 0
+end
+if seq <= tonumber(redis.call("hget", KEYS[1], "_seq") or "0") then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    local value = redis.call("hincrby", KEYS[1], ARGV[i], ARGV[i + 1])
+    if value <= 0 then
+        redis.call("hdel", KEYS[1], ARGV[i])
+    end
+end
+return 1
+"""
+
+# ARGV: ttl, seq знімка, потім пари поле/значення.
+# Знімок, старіший за вже побачену дельту, не записується (повертає 0)
+_REBUILD_SCRIPT = """
+local seq = tonumber(ARGV[2])
+if tonumber(redis.call("hget", KEYS[1], "_seen") or "0") > seq then
+    return 0
+end
+redis.call("del", KEYS[1])
+redis.call("hset", KEYS[1], "_ready", 1, "_seq", seq, "_seen", seq)
+for i = 3, #ARGV, 2 do
+    redis.call("hset", KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call("expire", KEYS[1], ARGV[1])
+return 1
+"""
+
+logger = logging.getLogger("watchlist.stats")
+
+
+def _key(user_id: int) -> str:
+    return f"stats:{user_id}"
+
+
+def movie_fields(movie: Any) -> list[str]:
+    """Поля агрегату, до яких входить фільм (ORM об'єкт або Row з status/genre/watch_date)."""
+    status = MovieStatus(movie.status)
+    fields = [f"s:{status.value}"]
+    fields += [f"g:{name}" for name in split_genres(movie.genre)]
+    if status == MovieStatus.watched and movie.watch_date:
+        fields.append(f"m:{movie.watch_date.year:04d}-{movie.watch_date.month:02d}")
+    return fields
+
+
+async def apply_movie_delta(
+        redis_client: redis.Redis,
+        user_id: int,
+        seq: int,
+        removed: Iterable[Any] = (),
+        added: Iterable[Any] = (),
+    ) -> None:
+    """
+    Оновити агрегат після коміту: removed — старі версії фільмів, added — нові.
+    seq — номер останньої зміни цього запису (з record_changes).
+    """
+    delta: Counter[str] = Counter()
+    for movie in removed:
+        delta.subtract(movie_fields(movie))
+    for movie in added:
+        delta.update(movie_fields(movie))
+
+    args: list[str | int] = []
+    for field, value in delta.items():
+        if value:
+            args += [field, value]
+
+    try:
+        # Навіть порожня дельта просуває _seen — перебудова зі старішого знімка не запишеться
+        await redis_client.eval(_APPLY_DELTA_SCRIPT, 1, _key(user_id), STATS_TTL, seq, *args) # type: ignore
+    except RedisError as e:
+        # Агрегат міг розійтись з БД — прибираємо, наступне читання перерахує
+        logger.warning(f"STATS | Delta for user {user_id} failed: {e}")
+        try:
+            await redis_client.delete(_key(user_id))
+        except RedisError:
+            pass
+
+
+async def compute_stats_fields(db: AsyncSession, user_id: int) -> dict[str, int]:
+    """Повний перерахунок агрегату одним запитом (UNION ALL трьох GROUP BY)."""
+    month = func.to_char(Movie.watch_date, "YYYY-MM")
+
+    status_q = (
+        select(literal("s").label("kind"), cast(Movie.status, String).label("key"), func.count().label("count"))
+        .where(Movie.user_id == user_id)
+        .group_by(Movie.status)
+    )
+    genre_q = (
+        select(literal("g").label("kind"), Genre.name.label("key"), func.count().label("count"))
+        .select_from(MovieGenre)
+        .join(Genre, Genre.id == MovieGenre.genre_id)
+        .join(Movie, Movie.id == MovieGenre.movie_id)
+        .where(Movie.user_id == user_id)
+        .group_by(Genre.name)
+    )
+    month_q = (
+        select(literal("m").label("kind"), month.label("key"), func.count().label("count"))
+        .where(
+            Movie.user_id == user_id,
+            Movie.status == MovieStatus.watched,
+            Movie.watch_date.isnot(None)
+        )
+        .group_by(month)
+    )
+
+    result = await db.execute(union_all(status_q, genre_q, month_q))
+    return {f"{kind}:{key}": int(count) for kind, key, count in result.all()}
+
+
+async def read_stats_snapshot(user_id: int) -> tuple[int, dict[str, int]]:
+    """
+    (change_seq, поля агрегату) з primary в одному знімку REPEATABLE READ:
+    номер і лічильники відповідають тому самому набору закомічених змін.
+    Репліка тут не підходить — відстала статистика жила б у Redis до STATS_TTL.
+    """
+    async with async_session() as db:
+        await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        seq = await get_change_seq(db, user_id)
+        fields = await compute_stats_fields(db, user_id)
+    return seq, fields
+
+
+async def rebuild_stats(redis_client: redis.Redis, user_id: int) -> dict[str, int]:
+    """
+    Перерахувати агрегат з primary і записати в Redis.
+    Якщо поки читали БД прийшла новіша дельта — знімок відкидається і читається заново;
+    після REBUILD_ATTEMPTS спроб повертаємо останній знімок, не кешуючи його.
+    """
+    fields: dict[str, int] = {}
+    for _ in range(REBUILD_ATTEMPTS):
+        seq, fields = await read_stats_snapshot(user_id)
+        args: list[str | int] = []
+        for field, value in fields.items():
+            args += [field, value]
+        try:
+            stored = await redis_client.eval(_REBUILD_SCRIPT, 1, _key(user_id), STATS_TTL, seq, *args) # type: ignore
+        except RedisError as e:
+            logger.warning(f"STATS | Cache write for user {user_id} failed: {e}")
+            break
+        if stored:
+            break
+        logger.debug(f"STATS | Rebuild for user {user_id} raced with a write, retrying")
+    return fields
+
+
+def build_response(fields: dict[str, int]) -> StatsResponse:
+    by_status: dict[str, int] = {}
+    genres: list[tuple[str, int]] = []
+    months: list[MonthlyHistory] = []
+
+    for field, value in fields.items():
+        kind, _, name = field.partition(":")
+        count = int(value)
+        if kind == "s":
+            by_status[name] = count
+        elif kind == "g":
+            genres.append((name, count))
+        elif kind == "m":
+            year, month = name.split("-")
+            months.append(MonthlyHistory(year=int(year), month=int(month), count=count))
+
+    genres.sort(key=lambda item: (-item[1], item[0]))
+    months.sort(key=lambda item: (item.year, item.month))
+
+    return StatsResponse(
+        by_status=by_status,
+        top_genres=[GenreCount(name=name, count=count) for name, count in genres[:5]],
+        monthly_history=months
+    )
+
+
+def _strip_meta(fields: dict[str, str]) -> dict[str, str]:
+    return {k: v for k, v in fields.items() if k not in META_FIELDS}
+
+
+def stats_version(fields: dict[str, Any]) -> str:
+    """
+    Версія вмісту агрегату для ETag — дайджест його полів.
+    Не _seq/_seen і не users.change_seq: коміт випереджає дельту, а дельти можуть застосуватись не по порядку.
+    """
+    payload = ",".join(f"{field}={int(value)}" for field, value in sorted(fields.items()))
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+async def get_user_stats(redis_client: redis.Redis, user_id: int) -> tuple[str, StatsResponse]:
+    """Статистика з агрегату; якщо його немає — перерахунок з primary. Повертає (версія для ETag, статистика)."""
+    try:
+        fields = await redis_client.hgetall(_key(user_id)) # type: ignore
+    except RedisError:
+        fields = {}
+
+    if READY_FIELD not in fields:
+        fields = await rebuild_stats(redis_client, user_id)
+    else:
+        fields = _strip_meta(fields)
+    return stats_version(fields), build_response(fields)
+
+
+async def check_stats_consistency(
+        redis_client: redis.Redis,
+        user_id: int,
+        repair: bool = True
+    ) -> bool:
+    """Порівняти агрегат у Redis з БД. При розбіжності (і repair=True) — перебудувати."""
+    cached = await redis_client.hgetall(_key(user_id)) # type: ignore
+    if READY_FIELD not in cached:
+        return True  # Агрегату немає — нема з чим розходитись
+
+    seq, actual = await read_stats_snapshot(user_id)
+    if int(cached.get(SEEN_FIELD, 0)) != seq:
+        return True  # Дельти ще в дорозі — порівнювати нема з чим, перевіримо наступного разу
+
+    consistent = {k: int(v) for k, v in _strip_meta(cached).items()} == actual
+    if not consistent:
+        logger.warning(f"STATS | Aggregate for user {user_id} drifted from database")
+        if repair:
+            await redis_client.delete(_key(user_id))
+            await rebuild_stats(redis_client, user_id)
+    return consistent
+
+
+async def _check_all() -> None:
+    """python -m app.services.stats — перевірити агрегати всіх юзерів."""
+    from app.core.redis_client import close_redis, get_redis
+    from app.database.models import User
+
+    redis_client = get_redis()
+    async with async_session() as db:
+        user_ids = (await db.execute(select(User.id))).scalars().all()
+    drifted = [uid for uid in user_ids if not await check_stats_consistency(redis_client, uid)]
+    await close_redis()
+    print(f"Checked {len(user_ids)} users, repaired: {drifted or 'none'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_check_all())
@@ -4,104 +4,214 @@
 """
 
 import redis.asyncio as redis
+import asyncio
+import logging
 import os
 import httpx
-import json
+import time
+import unicodedata
+import uuid
+from collections import Counter
 from dotenv import load_dotenv
 
+from app.core.cache import SingleFlight, TTLCache
+from app.core.rate_limit import tmdb_upstream_rate_limit
+from app.core.serialization import dumps, loads
+
 load_dotenv("app/.env")
 
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
 TMDB_IMAGE_BASE = "https://image.tmdb.org/t/p/w500"
 
-# Кеш для жанрів (завантажується один раз)
+# Налаштування спільного HTTP клієнта (пул з'єднань до TMDB)
+TMDB_MAX_CONNECTIONS = int(os.getenv("TMDB_MAX_CONNECTIONS", "50"))
+TMDB_MAX_KEEPALIVE = int(os.getenv("TMDB_MAX_KEEPALIVE", "20"))
+TMDB_KEEPALIVE_EXPIRY = float(os.getenv("TMDB_KEEPALIVE_EXPIRY", "30"))
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "10"))
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "5"))
+TMDB_HTTP2 = os.getenv("TMDB_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Як часто (сек) перечитувати мапу жанрів з Redis в пам'ять процесу
+GENRES_REFRESH_INTERVAL = float(os.getenv("TMDB_GENRES_REFRESH", "3600"))
+SEARCH_CACHE_TTL = int(os.getenv("TMDB_SEARCH_CACHE_TTL", "3600"))
+
+# Кеш деталей: свіжий запис віддається як є, "застарілий" — віддається,
+# але оновлюється у фоні (stale-while-revalidate). Після STALE — повний промах.
+DETAILS_FRESH_TTL = int(os.getenv("TMDB_DETAILS_FRESH_TTL", str(6 * 3600)))
+DETAILS_STALE_TTL = int(os.getenv("TMDB_DETAILS_STALE_TTL", str(24 * 3600)))
+DETAILS_LOCAL_SIZE = int(os.getenv("TMDB_DETAILS_LOCAL_SIZE", "1000"))
+
+# Короткий Redis-лок проти stampede між воркерами: хто не взяв лок — чекає на кеш
+UPSTREAM_LOCK_TTL_MS = int(os.getenv("TMDB_UPSTREAM_LOCK_TTL_MS", "5000"))
+UPSTREAM_LOCK_WAIT = float(os.getenv("TMDB_UPSTREAM_LOCK_WAIT", "3"))
+UPSTREAM_LOCK_POLL = 0.05
+
+# Видаляємо лок тільки якщо він досі наш (міг протермінуватись і дістатись іншому)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+logger = logging.getLogger("watchlist.tmdb")
+
 
+def normalize_query(query: str) -> str:
+    """Нормалізація пошукового запиту: Unicode (NFKC), регістр, пробіли."""
+    query = unicodedata.normalize("NFKC", query)
+    return " ".join(query.casefold().split())
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Створити довгоживучий клієнт для TMDB (один на процес, див. lifespan).
+    HTTP/2 (TMDB_HTTP2) потребує пакет h2: uv sync --extra http2. Без нього — HTTP/1.1 і попередження в лог.
+    """
+    http2 = TMDB_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("TMDB | TMDB_HTTP2 is set but h2 is not installed (uv sync --extra http2), using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        base_url=TMDB_BASE_URL,
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=TMDB_MAX_CONNECTIONS,
+            max_keepalive_connections=TMDB_MAX_KEEPALIVE,
+            keepalive_expiry=TMDB_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(TMDB_TIMEOUT, connect=TMDB_CONNECT_TIMEOUT),
+    )
 
 
 class TMDBService:
     """Клієнт для TMDB API."""
     
-    def __init__(self, redis_client: redis.Redis | None = None):
+    def __init__(self, redis_client: redis.Redis | None = None,
+                 http_client: httpx.AsyncClient | None = None):
         self.api_key = TMDB_API_KEY
         self.base_url = TMDB_BASE_URL
         self.genres_loaded = False
         self.redis_client = redis_client
+        # Локальна копія "tmdb:genres" { "28": "Бойовик", ... }
+        self._genre_map: dict[str, str] = {}
+        self._genre_map_loaded_at = 0.0
+        # Лічильники влучань/промахів кешу (віддаються через /metrics)
+        self.cache_stats: Counter[str] = Counter()
+        # Локальний LRU для деталей { tmdb_id: {"data": ..., "fetched_at": ...} }
+        self._details_cache = TTLCache(maxsize=DETAILS_LOCAL_SIZE, ttl=DETAILS_FRESH_TTL + DETAILS_STALE_TTL)
+        self._refreshing: set[int] = set()
+        self._background_tasks: set[asyncio.Task] = set()
+        # Одночасні промахи з однаковим ключем йдуть в TMDB один раз
+        self._flight = SingleFlight()
+        # Якщо клієнт не передали — створюємо свій (закривається в aclose())
+        self._owns_client = http_client is None
+        self.http_client = http_client or create_http_client()
+
+    async def aclose(self) -> None:
+        """Закрити HTTP клієнт, якщо сервіс ним володіє."""
+        if self._owns_client:
+            await self.http_client.aclose()
         
     async def load_genres(self) -> None:
         """Завантажити список жанрів з TMDB."""
         if self.genres_loaded or not self.redis_client:
             return
             
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/genre/movie/list",
-                params={
-                    "api_key": self.api_key,
-                    "language": "uk-UA"
-                }
-            )
-            if response.status_code == 200:
-                data = response.json()
-                await self.redis_client.hset("tmdb:genres", mapping={ # type: ignore
-                    str(g["id"]): g["name"] for g in data.get("genres", [])
-                })
-                self.genres_loaded = True
+        response = await self.http_client.get(
+            "/genre/movie/list",
+            params={
+                "api_key": self.api_key,
+                "language": "uk-UA"
+            }
+        )
+        if response.status_code == 200:
+            data = response.json()
+            mapping = {str(g["id"]): g["name"] for g in data.get("genres", [])}
+            await self.redis_client.hset("tmdb:genres", mapping=mapping) # type: ignore
+            self._genre_map = mapping
+            self._genre_map_loaded_at = time.monotonic()
+            self.genres_loaded = True
+
+
+    async def get_genre_map(self) -> dict[str, str]:
+        """
+        Мапа жанрів з пам'яті процесу.
+        Redis читається одним HGETALL не частіше ніж раз на GENRES_REFRESH_INTERVAL.
+        """
+        if not self.redis_client:
+            return self._genre_map
+
+        expired = time.monotonic() - self._genre_map_loaded_at > GENRES_REFRESH_INTERVAL
+        if not self._genre_map or expired:
+            mapping = await self.redis_client.hgetall("tmdb:genres")  # type: ignore
+            if mapping:
+                self._genre_map = mapping
+            self._genre_map_loaded_at = time.monotonic()
+
+        return self._genre_map
+
+
+    def genres_text(self, genre_ids: list[int], genre_map: dict[str, str]) -> str:
+        """Перетворити список ID жанрів у текст по готовій мапі."""
+        genres = [genre_map[str(gid)] for gid in genre_ids if str(gid) in genre_map]
+        return ", ".join(genres[:3]) if genres else ""
     
 
     async def get_genres_text(self, genre_ids: list[int]) -> str:
         """Перетворити список ID жанрів у текст."""
         if not self.redis_client or not genre_ids:
             return ""        
-        
-        genres = []
-        for gid in genre_ids:
-            genre_name = await self.redis_client.hget("tmdb:genres", str(gid))  # type: ignore
-            if genre_name:
-                genres.append(genre_name)
 
-        return ", ".join(genres[:3]) if genres else ""
+        return self.genres_text(genre_ids, await self.get_genre_map())
         
 
     async def search_movies(self, query: str, page: int = 1) -> dict:
         """Пошук фільмів за назвою."""
         await self.load_genres()
+        await tmdb_upstream_rate_limit()
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/search/movie",
-                params={
-                    "api_key": self.api_key,
-                    "query": query,
-                    "page": page,
-                    "language": "uk-UA",
-                    "include_adult": False
-                }
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self.http_client.get(
+            "/search/movie",
+            params={
+                "api_key": self.api_key,
+                "query": query,
+                "page": page,
+                "language": "uk-UA",
+                "include_adult": False
+            }
+        )
+        response.raise_for_status()
+        return response.json()
     
 
     async def get_movie_details(self, tmdb_id: int) -> dict:
         """Отримати детальну інформацію про фільм."""
         await self.load_genres()
+        await tmdb_upstream_rate_limit()
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/movie/{tmdb_id}",
-                params={
-                    "api_key": self.api_key,
-                    "language": "uk-UA",
-                    "append_to_response": "credits"  # Додаємо інфо про акторів/режисерів
-                }
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self.http_client.get(
+            f"/movie/{tmdb_id}",
+            params={
+                "api_key": self.api_key,
+                "language": "uk-UA",
+                "append_to_response": "credits"  # Додаємо інфо про акторів/режисерів
+            }
+        )
+        response.raise_for_status()
+        return response.json()
     
 
-    async def format_movie_result(self, movie: dict) -> dict:
+    async def format_movie_result(self, movie: dict, genre_map: dict[str, str] | None = None) -> dict:
         """Форматування результату пошуку для фронтенду."""
         genre_ids = movie.get("genre_ids", [])
+        if genre_map is None:
+            genre_map = await self.get_genre_map()
         
         return {
             "tmdb_id": movie.get("id"),
@@ -113,7 +223,7 @@ class TMDBService:
             "backdrop_url": f"{TMDB_IMAGE_BASE}{movie.get('backdrop_path')}" if movie.get("backdrop_path") else None,
             "vote_average": movie.get("vote_average"),
             "vote_count": movie.get("vote_count"),
-            "genre": await self.get_genres_text(genre_ids),
+            "genre": self.genres_text(genre_ids, genre_map),
             "genre_ids": genre_ids,
         }
     
@@ -150,40 +260,155 @@ class TMDBService:
         }
     
 
-    async def search_and_format(self, query: str, page: int = 1) -> list[dict]:
-        """Пошук та форматування результатів."""
-        cache_key = f"tmdb:search:{query}:{page}"
-        
-        # Спроба отримати з кешу
-        json_data = await self.redis_client.get(cache_key) # type: ignore
-        
-        data = None
-        if json_data:
-            data = json.loads(json_data)
-        
-        # Якщо в кеші немає - запит до API
-        if not data:
-            data = await self.search_movies(query, page)
-            # Зберігаємо в кеш на 1 годину (3600 сек)
-            await self.redis_client.setex( # type: ignore
-                cache_key, 
-                3600, 
-                json.dumps(data)
-            )
+    async def _with_upstream_lock(self, cache_key: str, read_cache, fetch):
+        """
+        Виконати fetch() під коротким Redis-локом.
+        Якщо лок тримає інший воркер — чекаємо, поки він заповнить кеш (read_cache),
+        а якщо не дочекались — йдемо в TMDB самі.
+        """
+        if not self.redis_client:
+            return await fetch()
+
+        lock_key = f"lock:{cache_key}"
+        token = uuid.uuid4().hex
+        acquired = await self.redis_client.set(lock_key, token, nx=True, px=UPSTREAM_LOCK_TTL_MS)
+
+        if not acquired:
+            self.cache_stats["upstream_lock_wait"] += 1
+            deadline = time.monotonic() + UPSTREAM_LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(UPSTREAM_LOCK_POLL)
+                cached = await read_cache()
+                if cached is not None:
+                    return cached
 
-        # Форматування результату (спільне для кешу та API)
+        try:
+            return await fetch()
+        finally:
+            if acquired:
+                await self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token) # type: ignore
+
+
+    async def _get_search_cached(self, cache_key: str) -> list[dict] | None:
+        cached = await self.redis_client.get(cache_key) # type: ignore
+        return loads(cached) if cached is not None else None
+
+
+    async def _fetch_search(self, query: str, page: int, cache_key: str) -> list[dict]:
+        """Запит до API, форматування і запис сторінки в кеш."""
+        self.cache_stats["search_upstream"] += 1
+        data = await self.search_movies(query, page)
+
+        # Мапа жанрів береться один раз на всю сторінку
+        genre_map = await self.get_genre_map()
         results = []
         for movie in data.get("results", []):
-            formatted = await self.format_movie_result(movie)
+            formatted = await self.format_movie_result(movie, genre_map)
             results.append(formatted)
-            
+
+        # Зберігаємо в кеш (за замовчуванням на 1 годину)
+        await self.redis_client.setex(cache_key, SEARCH_CACHE_TTL, dumps(results)) # type: ignore
+
         return results
+
+
+    async def search_and_format(self, query: str, page: int = 1) -> list[dict]:
+        """
+        Пошук та форматування результатів.
+        В кеші лежить вже відформатована сторінка — hit = один GET + один decode.
+        """
+        query = normalize_query(query)
+        cache_key = f"tmdb:search:v2:{query}:{page}"
+
+        # Спроба отримати з кешу
+        cached = await self._get_search_cached(cache_key)
+        if cached is not None:
+            self.cache_stats["search_hit"] += 1
+            return cached
+
+        self.cache_stats["search_miss"] += 1
+
+        # Якщо в кеші немає - запит до API (один на ключ, навіть при багатьох одночасних промахах)
+        return await self._flight.do(cache_key, lambda: self._with_upstream_lock(
+            cache_key,
+            lambda: self._get_search_cached(cache_key),
+            lambda: self._fetch_search(query, page, cache_key),
+        ))
     
 
     async def get_details_formatted(self, tmdb_id: int) -> dict:
-        """Отримати відформатовані деталі фільму."""
-        data = await self.get_movie_details(tmdb_id)
-        return self.format_movie_details(data)
+        """
+        Отримати відформатовані деталі фільму.
+        Кеш у два рівні: LRU процесу → Redis → TMDB API.
+        """
+        entry = self._details_cache.get(tmdb_id)
+
+        if entry is None and self.redis_client:
+            cached = await self.redis_client.get(f"tmdb:details:{tmdb_id}")
+            if cached is not None:
+                entry = loads(cached)
+                age = time.time() - entry["fetched_at"]
+                self._details_cache.set(tmdb_id, entry, ttl=max(DETAILS_FRESH_TTL + DETAILS_STALE_TTL - age, 0))
+
+        if entry is None:
+            self.cache_stats["details_miss"] += 1
+            cache_key = f"tmdb:details:{tmdb_id}"
+            return await self._flight.do(cache_key, lambda: self._with_upstream_lock(
+                cache_key,
+                lambda: self._get_details_cached(tmdb_id),
+                lambda: self._fetch_details(tmdb_id),
+            ))
+
+        self.cache_stats["details_hit"] += 1
+        if time.time() - entry["fetched_at"] > DETAILS_FRESH_TTL:
+            self.cache_stats["details_stale"] += 1
+            self._schedule_details_refresh(tmdb_id)
+
+        return entry["data"]
+
+
+    async def _get_details_cached(self, tmdb_id: int) -> dict | None:
+        cached = await self.redis_client.get(f"tmdb:details:{tmdb_id}") # type: ignore
+        return loads(cached)["data"] if cached is not None else None
+
+
+    async def _fetch_details(self, tmdb_id: int) -> dict:
+        """Завантажити деталі з TMDB і покласти в обидва рівні кешу."""
+        self.cache_stats["details_upstream"] += 1
+        data = self.format_movie_details(await self.get_movie_details(tmdb_id))
+        entry = {"data": data, "fetched_at": time.time()}
+
+        self._details_cache.set(tmdb_id, entry)
+        if self.redis_client:
+            await self.redis_client.setex(
+                f"tmdb:details:{tmdb_id}",
+                DETAILS_FRESH_TTL + DETAILS_STALE_TTL,
+                dumps(entry)
+            )
+
+        return data
+
+
+    def _schedule_details_refresh(self, tmdb_id: int) -> None:
+        """Фонове оновлення застарілого запису (одне на tmdb_id одночасно)."""
+        if tmdb_id in self._refreshing:
+            return
+
+        self._refreshing.add(tmdb_id)
+        task = asyncio.create_task(self._refresh_details(tmdb_id))
+        # Тримаємо посилання, щоб таску не прибрав GC
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+
+    async def _refresh_details(self, tmdb_id: int) -> None:
+        try:
+            await self._flight.do(f"tmdb:details:{tmdb_id}", lambda: self._fetch_details(tmdb_id))
+        except Exception as e:
+            # Застарілий запис лишається в кеші — спробуємо при наступному зверненні
+            logger.warning(f"TMDB | Background refresh for {tmdb_id} failed: {e}")
+        finally:
+            self._refreshing.discard(tmdb_id)
 
 
 # Singleton instance - буде ініціалізовано при старті застосунку
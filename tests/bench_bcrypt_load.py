@@ -0,0 +1,122 @@
+"""
+Навантажувальний тест bcrypt: BCRYPT_MAX_PENDING одночасних verify_password (як шторм логінів)
+не повинні зупиняти event loop — GET /movies/ у цей час вкладається в LOAD_P99_BUDGET_MS.
+
+    DATABASE_URL=postgresql+asyncpg://... uv run pytest tests/bench_bcrypt_load.py -s
+Без DATABASE_URL модуль пропускається.
+"""
+
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import bcrypt
+import fakeredis
+import httpx
+import pytest_asyncio
+from sqlalchemy import text
+
+import app.core.redis_client as redis_client
+from app.auth import security
+from app.auth.security import create_access_token, verify_password
+from app.core.main import app
+from app.database.database import async_session, engine
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+REQUESTS = 200
+MOVIES = 50
+# Якщо bcrypt опиниться в event loop, кожен запит чекатиме сотні мс на хеш
+LOAD_P99_BUDGET_MS = float(os.getenv("LOAD_P99_BUDGET_MS", "100"))
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client():
+    original = redis_client.redis_client
+    redis_client.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO users (email, username, hashed_password, created_at, is_active, change_seq)
+            VALUES (:email, :email, 'x', now(), true, 0)
+        """), {"email": email})
+        await db.execute(text("""
+            INSERT INTO movies (user_id, title, year, genre, status, added_date)
+            SELECT u.id, 'Movie ' || g, 2000, 'Drama', 'watched', now() - g * interval '1 hour'
+            FROM users u, generate_series(1, :movies) g
+            WHERE u.email = :email
+        """), {"email": email, "movies": MOVIES})
+        await db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers)
+    try:
+        yield client
+    finally:
+        await client.aclose()
+        async with async_session() as db:
+            await db.execute(text(
+                "DELETE FROM movies WHERE user_id IN (SELECT id FROM users WHERE email = :email)"
+            ), {"email": email})
+            await db.execute(text("DELETE FROM users WHERE email = :email"), {"email": email})
+            await db.commit()
+        security._principal_cache.clear()
+        await redis_client.redis_client.aclose()
+        redis_client.redis_client = original
+        await engine.dispose()
+
+
+async def _latencies(client: httpx.AsyncClient) -> list[float]:
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await client.get("/movies/?limit=50")
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return latencies
+
+
+async def test_movies_latency_under_login_storm(client):
+    hashed = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=security.BCRYPT_ROUNDS)).decode()
+    stop = asyncio.Event()
+    verified = 0
+
+    async def login_storm():
+        nonlocal verified
+        while not stop.is_set():
+            assert await verify_password("secret", hashed)
+            verified += 1
+            await asyncio.sleep(0)  # Окремі логіни — окремі запити, між ними loop вільний
+
+    idle = statistics.quantiles(await _latencies(client), n=100)
+
+    # Рівно BCRYPT_MAX_PENDING — пул потоків зайнятий повністю, але без 503
+    storm = [asyncio.create_task(login_storm()) for _ in range(security.BCRYPT_MAX_PENDING)]
+    try:
+        started = time.perf_counter()
+        # Заблокований loop інакше тягнув би вимір хвилинами
+        async with asyncio.timeout(REQUESTS * LOAD_P99_BUDGET_MS / 1000):
+            loaded = statistics.quantiles(await _latencies(client), n=100)
+        elapsed = time.perf_counter() - started
+    except TimeoutError:
+        pytest.fail(f"{REQUESTS} GET /movies/ took over {REQUESTS * LOAD_P99_BUDGET_MS / 1000:.0f}s under bcrypt load")
+    finally:
+        stop.set()
+        await asyncio.gather(*storm)
+
+    print(f"\nGET /movies/ x{REQUESTS}            {'p50, ms':>8} {'p99, ms':>8}")
+    print(f"idle                         {idle[49]:>8.2f} {idle[98]:>8.2f}")
+    print(f"{security.BCRYPT_MAX_PENDING} verify_password in flight {loaded[49]:>8.2f} {loaded[98]:>8.2f}")
+    print(f"bcrypt rounds={security.BCRYPT_ROUNDS} workers={security.BCRYPT_WORKERS}: "
+          f"{verified / elapsed:.1f} verifications/s, {os.cpu_count()} CPU")
+
+    assert verified > 0
+    assert loaded[98] < LOAD_P99_BUDGET_MS
@@ -0,0 +1,96 @@
+"""
+Бенчмарк вставки: POST /movies/bulk (одна транзакція, multi-row INSERT) проти POST /movies/ на кожен фільм.
+Рядків на секунду, з повним шляхом ендпоїнта (жанри, журнал змін, дельта статистики).
+
+    DATABASE_URL=postgresql+asyncpg://... uv run pytest tests/bench_bulk_insert.py -s
+Без DATABASE_URL модуль пропускається.
+"""
+
+import os
+import time
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import fakeredis
+import httpx
+import pytest_asyncio
+from sqlalchemy import text
+
+import app.core.redis_client as redis_client
+from app.auth.security import create_access_token
+from app.core.main import app
+from app.database.database import async_session, engine
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+SINGLE_ROWS = 500
+BULK_SIZES = (100, 1000, 5000)
+TAG = uuid.uuid4().hex[:8]
+
+
+def _movies(count: int, offset: int = 0) -> list[dict]:
+    return [
+        {"title": f"Movie {i}", "year": 1950 + i % 70, "genre": f"Bench {TAG} {i % 10}",
+         "status": "watched", "overview": "Опис фільму " * 5}
+        for i in range(offset, offset + count)
+    ]
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client():
+    original = redis_client.redis_client
+    redis_client.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    email = f"bench-{TAG}@example.com"
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO users (email, username, hashed_password, created_at, is_active, change_seq)
+            VALUES (:email, :email, 'x', now(), true, 0)
+        """), {"email": email})
+        await db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers)
+    try:
+        yield client
+    finally:
+        await client.aclose()
+        async with async_session() as db:
+            await db.execute(text(
+                "DELETE FROM movies WHERE user_id IN (SELECT id FROM users WHERE email = :email)"
+            ), {"email": email})
+            await db.execute(text("DELETE FROM users WHERE email = :email"), {"email": email})
+            await db.execute(text("DELETE FROM genres WHERE name LIKE :name"), {"name": f"Bench {TAG} %"})
+            await db.commit()
+        await redis_client.redis_client.aclose()
+        redis_client.redis_client = original
+        await engine.dispose()
+
+
+async def test_bench_bulk_vs_single(client):
+    start = time.perf_counter()
+    for movie in _movies(SINGLE_ROWS):
+        response = await client.post("/movies/", json=movie)
+        assert response.status_code == 200, response.text
+    single_rate = SINGLE_ROWS / (time.perf_counter() - start)
+
+    bulk_rates = {}
+    offset = SINGLE_ROWS
+    for size in BULK_SIZES:
+        start = time.perf_counter()
+        response = await client.post("/movies/bulk", json=_movies(size, offset))
+        assert response.status_code == 200, response.text
+        assert len(response.json()) == size
+        bulk_rates[size] = size / (time.perf_counter() - start)
+        offset += size
+
+    print(f"\n{'':<26} {'rows/s':>8}")
+    print(f"{f'POST /movies/ x{SINGLE_ROWS}':<26} {single_rate:>8.0f}")
+    for size, rate in bulk_rates.items():
+        print(f"{f'POST /movies/bulk ({size})':<26} {rate:>8.0f}")
+
+    assert min(bulk_rates.values()) > single_rate
@@ -0,0 +1,113 @@
+"""
+Бенчмарк GET /movies/ з кешем принципала і без нього (p50 / p99).
+Без кешу: локальний кеш очищується перед кожним запитом, а Redis не віддає знімок —
+юзер щоразу читається з БД, як до кешування.
+
+    DATABASE_URL=postgresql+asyncpg://... uv run pytest tests/bench_principal_cache.py -s
+Без DATABASE_URL модуль пропускається.
+"""
+
+import os
+import statistics
+import time
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import fakeredis
+import httpx
+import pytest_asyncio
+from sqlalchemy import text
+
+import app.core.redis_client as redis_client
+from app.auth import security
+from app.auth.security import create_access_token
+from app.core.main import app
+from app.database.database import async_session, engine
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+REQUESTS = 500
+WARMUP = 20
+MOVIES = 50
+
+
+class PrincipalMissRedis(fakeredis.aioredis.FakeRedis):
+    """fakeredis, у якому немає знімків принципала — кожен запит іде по юзера в БД."""
+
+    async def get(self, name):
+        if str(name).startswith("auth:principal:"):
+            return None
+        return await super().get(name)
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def client():
+    original = redis_client.redis_client
+    redis_client.redis_client = PrincipalMissRedis(decode_responses=True)
+
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO users (email, username, hashed_password, created_at, is_active, change_seq)
+            VALUES (:email, :email, 'x', now(), true, 0)
+        """), {"email": email})
+        await db.execute(text("""
+            INSERT INTO movies (user_id, title, year, genre, status, added_date)
+            SELECT u.id, 'Movie ' || g, 2000, 'Drama', 'watched', now() - g * interval '1 hour'
+            FROM users u, generate_series(1, :movies) g
+            WHERE u.email = :email
+        """), {"email": email, "movies": MOVIES})
+        await db.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers)
+    try:
+        yield client
+    finally:
+        await client.aclose()
+        async with async_session() as db:
+            await db.execute(text(
+                "DELETE FROM movies WHERE user_id IN (SELECT id FROM users WHERE email = :email)"
+            ), {"email": email})
+            await db.execute(text("DELETE FROM users WHERE email = :email"), {"email": email})
+            await db.commit()
+        security._principal_cache.clear()
+        await redis_client.redis_client.aclose()
+        redis_client.redis_client = original
+        await engine.dispose()
+
+
+async def _latencies(client: httpx.AsyncClient, cached: bool) -> list[float]:
+    """Послідовні GET /movies/; затримка кожного в мс."""
+    latencies = []
+    for i in range(WARMUP + REQUESTS):
+        if not cached:
+            security._principal_cache.clear()
+        start = time.perf_counter()
+        response = await client.get("/movies/?limit=50")
+        elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code == 200, response.text
+        if i >= WARMUP:
+            latencies.append(elapsed)
+    return latencies
+
+
+def _percentiles(latencies: list[float]) -> tuple[float, float]:
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49], cuts[98]
+
+
+async def test_bench_principal_cache(client):
+    # Кеш увімкнений: знімок лежить у локальному кеші процесу після першого запиту
+    cached = _percentiles(await _latencies(client, cached=True))
+    uncached = _percentiles(await _latencies(client, cached=False))
+
+    print(f"\nGET /movies/ x{REQUESTS}   {'p50, ms':>8} {'p99, ms':>8}")
+    print(f"principal cache on   {cached[0]:>8.2f} {cached[1]:>8.2f}")
+    print(f"principal cache off  {uncached[0]:>8.2f} {uncached[1]:>8.2f}")
+
+    assert cached[0] < uncached[0]
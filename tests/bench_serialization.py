@@ -0,0 +1,91 @@
+"""
+Бенчмарк серіалізації сторінки GET /movies/ на 10k рядків:
+старий шлях (ORM-об'єкти → MovieResponse → jsonable_encoder → json) проти нового (Row._asdict() → orjson).
+Час і байти на дроті — без стиснення і після gzip з рівнем застосунку.
+
+    uv run pytest tests/bench_serialization.py -s
+"""
+
+import gzip
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from app.core.main import GZIP_LEVEL
+from app.core.serialization import FastJSONResponse, loads
+from app.database.models import Movie, MovieStatus
+from app.database.schemas import MovieResponse
+
+ROWS = 10_000
+ROUNDS = 5
+
+FIELDS = tuple(MovieResponse.model_fields)
+
+
+def _values(i: int) -> dict:
+    added = datetime(2024, 1, 1) + timedelta(hours=i)
+    return {
+        "id": i,
+        "tmdb_id": 1000 + i,
+        "title": f"Фільм {i}",
+        "original_title": f"Movie {i}",
+        "year": 1950 + i % 70,
+        "genre": "Драма, Комедія",
+        "poster_url": f"https://image.tmdb.org/t/p/w500/poster{i}.jpg",
+        "overview": "Опис фільму " * 10,
+        "runtime": 90 + i % 60,
+        "status": list(MovieStatus)[i % 3],
+        "user_rating": None if i % 4 == 0 else float(i % 10),
+        "notes": None,
+        "added_date": added,
+        "updated_date": added if i % 2 else None,
+    }
+
+
+def _orm_movies() -> list[Movie]:
+    return [Movie(**_values(i)) for i in range(ROWS)]
+
+
+def _rows() -> list:
+    # Такі самі Row, як повертає select(*MOVIE_RESPONSE_COLUMNS)
+    data = [tuple(_values(i)[field] for field in FIELDS) for i in range(ROWS)]
+    return IteratorResult(SimpleResultMetaData(FIELDS), iter(data)).all()
+
+
+def _old_body(movies: list[Movie]) -> bytes:
+    content = jsonable_encoder([MovieResponse.model_validate(movie) for movie in movies])
+    return JSONResponse(content).body
+
+
+def _new_body(rows: list) -> bytes:
+    return FastJSONResponse([row._asdict() for row in rows]).body
+
+
+def _best(fn, arg) -> tuple[float, bytes]:
+    """Найкращий час з ROUNDS прогонів (мс) і тіло відповіді."""
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        body = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, body
+
+
+def test_bench_movie_list_serialization():
+    old_ms, old_body = _best(_old_body, _orm_movies())
+    new_ms, new_body = _best(_new_body, _rows())
+
+    print(f"\n{f'{ROWS} rows':<20} {'ms':>8} {'bytes':>10} {'gzip bytes':>12} {'gzip ms':>10}")
+    for name, ms, body in (("MovieResponse+json", old_ms, old_body), ("Row+orjson", new_ms, new_body)):
+        start = time.perf_counter()
+        packed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        gzip_ms = (time.perf_counter() - start) * 1000
+        print(f"{name:<20} {ms:>8.1f} {len(body):>10} {len(packed):>12} {gzip_ms:>10.1f}")
+
+    # Обидва шляхи віддають той самий JSON
+    assert loads(new_body) == loads(old_body)
+    assert new_ms < old_ms
+    assert len(new_body) <= len(old_body)
@@ -0,0 +1,97 @@
+"""
+Бенчмарк HTTP клієнта TMDB на локальному stub-сервері (asyncio, справжній TCP):
+новий httpx.AsyncClient на кожен запит (холодне з'єднання) проти спільного create_http_client().
+Затримка послідовних запитів (p50 / p99) і пропускна здатність при CONCURRENCY паралельних.
+До справжнього TMDB різниця більша — там до кожного холодного з'єднання додається TLS handshake.
+
+    uv run pytest tests/bench_tmdb_client.py -s
+"""
+
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from app.services import tmdb
+
+REQUESTS = 500
+CONCURRENCY = 20
+
+BODY = json.dumps({"page": 1, "results": [{"id": i, "title": f"Movie {i}"} for i in range(20)]}).encode()
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\ncontent-type: application/json\r\n"
+    + f"content-length: {len(BODY)}\r\n\r\n".encode()
+    + BODY
+)
+
+
+async def stub_tmdb(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Мінімальний HTTP/1.1 "TMDB" з keep-alive: однакова сторінка пошуку на будь-який GET."""
+    try:
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _sequential(get) -> list[float]:
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await get()
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    return latencies
+
+
+async def _throughput(get) -> float:
+    """Запитів на секунду: REQUESTS запитів, не більше CONCURRENCY одночасно."""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            assert (await get()).status_code == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def test_bench_pooled_vs_cold_client(monkeypatch):
+    server = await asyncio.start_server(stub_tmdb, "127.0.0.1", 0)
+    base_url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/3"
+
+    params = {"query": "matrix", "api_key": "test-key"}
+
+    async def cold_get():
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            return await client.get("/search/movie", params=params)
+
+    monkeypatch.setattr(tmdb, "TMDB_BASE_URL", base_url)
+    pooled = tmdb.create_http_client()
+
+    async def pooled_get():
+        return await pooled.get("/search/movie", params=params)
+
+    try:
+        results = {}
+        for name, get in (("new client per call", cold_get), ("create_http_client()", pooled_get)):
+            cuts = statistics.quantiles(await _sequential(get), n=100)
+            results[name] = (cuts[49], cuts[98], await _throughput(get))
+    finally:
+        await pooled.aclose()
+        server.close()
+        await server.wait_closed()
+
+    print(f"\n{'':<22} {'p50, ms':>8} {'p99, ms':>8} {'req/s':>8}")
+    for name, (p50, p99, rps) in results.items():
+        print(f"{name:<22} {p50:>8.2f} {p99:>8.2f} {rps:>8.0f}")
+
+    cold, warm = results["new client per call"], results["create_http_client()"]
+    assert warm[0] < cold[0]
+    assert warm[2] > cold[2]
@@ -0,0 +1,19 @@
+import os
+
+# Модулі app читають конфіг при імпорті — задаємо його до імпорту тестів
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("TMDB_API_KEY", "test-key")
+
+import fakeredis
+import pytest
+
+import app.core.redis_client as redis_client
+
+
+@pytest.fixture
+async def fake_redis(monkeypatch):
+    """Глобальний get_redis() віддає fakeredis (з Lua — для rate limit і локів)."""
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "redis_client", client)
+    yield client
+    await client.aclose()
@@ -0,0 +1,16 @@
+from app.database.genres import MAX_GENRES_PER_MOVIE, _chunks, split_genres
+
+
+def test_split_genres_dedupes_and_trims():
+    assert split_genres(" Драма, Комедія,,Драма ") == ["Драма", "Комедія"]
+    assert split_genres(None) == []
+
+
+def test_split_genres_is_capped_per_movie():
+    text = ",".join(f"g{i}" for i in range(MAX_GENRES_PER_MOVIE * 3))
+    assert split_genres(text) == [f"g{i}" for i in range(MAX_GENRES_PER_MOVIE)]
+
+
+def test_chunks():
+    assert list(_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(_chunks([], 2)) == []
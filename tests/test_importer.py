@@ -0,0 +1,96 @@
+import asyncio
+import io
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import importer
+from app.services.importer import ImportFormatError, enrich_row, iter_json_rows
+
+
+class FlakyTMDB:
+    """search_and_format, що спершу відповідає помилками зі списку, а потім — збігом."""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def search_and_format(self, query: str, page: int = 1) -> list[dict]:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [{"tmdb_id": 603, "year": 1999, "genre": "Фантастика", "original_title": query}]
+
+
+def _tmdb_429() -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", "https://api.themoviedb.org/3/search/movie")
+    response = httpx.Response(429, headers={"Retry-After": "0"}, request=request)
+    return httpx.HTTPStatusError("Too Many Requests", request=request, response=response)
+
+
+async def test_enrich_waits_out_rate_limits(fake_redis):
+    tmdb = FlakyTMDB(HTTPException(status_code=429, headers={"Retry-After": "0"}), _tmdb_429())
+    data = {"title": "The Matrix"}
+
+    assert await enrich_row(data, tmdb, asyncio.Semaphore(1), user_id=1) is True
+    assert tmdb.calls == 3
+    assert data["genre"] == "Фантастика"
+    assert data["tmdb_id"] == 603
+
+
+async def test_enrich_reports_failed_lookup(fake_redis, monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_ENRICH_RETRIES", 1)
+    tmdb = FlakyTMDB(*(HTTPException(status_code=429, headers={"Retry-After": "0"}) for _ in range(2)))
+    data = {"title": "The Matrix"}
+
+    assert await enrich_row(data, tmdb, asyncio.Semaphore(1), user_id=1) is False
+    assert tmdb.calls == 2
+    assert "genre" not in data
+
+
+@pytest.mark.parametrize("error", [RuntimeError("boom"), HTTPException(status_code=503)])
+async def test_enrich_does_not_retry_other_errors(fake_redis, error):
+    tmdb = FlakyTMDB(error)
+
+    assert await enrich_row({"title": "The Matrix"}, tmdb, asyncio.Semaphore(1), user_id=1) is False
+    assert tmdb.calls == 1
+
+
+MOVIES = [{"title": f"Movie {i}", "year": 1990 + i, "overview": "x" * 100} for i in range(50)]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Шматки по 64 символи — об'єкти постійно розрізані межею шматка."""
+    monkeypatch.setattr(importer, "READ_CHUNK_SIZE", 64)
+
+
+def test_json_array(small_chunks):
+    assert list(iter_json_rows(io.StringIO(json.dumps(MOVIES, indent=2)))) == MOVIES
+
+
+def test_ndjson(small_chunks):
+    text = "\n".join(json.dumps(movie) for movie in MOVIES) + "\n"
+    assert list(iter_json_rows(io.StringIO(text))) == MOVIES
+
+
+def test_json_wrapper_rejected(small_chunks):
+    with pytest.raises(ImportFormatError, match="Wrapped"):
+        list(iter_json_rows(io.StringIO(json.dumps({"movies": MOVIES}))))
+
+
+def test_json_oversized_value_rejected(small_chunks, monkeypatch):
+    monkeypatch.setattr(importer, "IMPORT_MAX_ROW_SIZE", 1000)
+    text = json.dumps([MOVIES[0], {"title": "Huge", "overview": "x" * 5000}, MOVIES[1]])
+    rows = iter_json_rows(io.StringIO(text))
+
+    assert next(rows) == MOVIES[0]
+    with pytest.raises(ImportFormatError, match="larger than 1000"):
+        next(rows)
+
+
+def test_json_truncated_file():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_rows(io.StringIO(json.dumps(MOVIES)[:-10])))
@@ -0,0 +1,35 @@
+import json
+import logging
+from queue import SimpleQueue
+
+from app.core.logger import JsonFormatter, LocalQueueHandler
+
+
+def _queued_record(queue: SimpleQueue) -> logging.LogRecord:
+    logger = logging.getLogger("watchlist.tests.logger")
+    logger.propagate = False
+    handler = LocalQueueHandler(queue)
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Failed for user %s", 7)
+    finally:
+        logger.removeHandler(handler)
+    return queue.get_nowait()
+
+
+def test_exception_survives_the_queue():
+    record = _queued_record(SimpleQueue())
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Failed for user 7"
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_text_formatter_still_prints_traceback():
+    record = _queued_record(SimpleQueue())
+
+    text = logging.Formatter("%(message)s").format(record)
+    assert text.startswith("Failed for user 7\nTraceback")
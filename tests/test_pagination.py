@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def _token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, value", [
+    ("added_date", datetime(2024, 5, 1, 12, 30)),
+    ("added_date", None),
+    ("year", 1999),
+    ("user_rating", 8.5),
+    ("user_rating", None),
+    ("title", "Матриця"),
+])
+def test_cursor_round_trip(sort, value):
+    movie = SimpleNamespace(id=42, **{sort: value})
+    assert decode_cursor(encode_cursor(sort, "desc", movie), sort, "desc") == (value, 42)
+
+
+@pytest.mark.parametrize("sort, value, last_id", [
+    ("added_date", "not a date", 1),
+    ("added_date", 1714560000, 1),
+    ("year", "1999", 1),
+    ("year", True, 1),
+    ("year", 2**40, 1),
+    ("year", None, 1),
+    ("user_rating", "8.5", 1),
+    ("user_rating", [8], 1),
+    ("title", 7, 1),
+    ("title", None, 1),
+    ("title", "Матриця", "1"),
+    ("title", "Матриця", 1.5),
+])
+def test_wrong_typed_cursor_is_invalid(sort, value, last_id):
+    token = _token({"s": sort, "o": "desc", "v": value, "id": last_id})
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, sort, "desc")
+
+
+@pytest.mark.parametrize("token", ["!!!", _token("string"), _token([1, 2]), _token({"s": "title"})])
+def test_malformed_cursor_is_invalid(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "title", "desc")
+
+
+def test_cursor_for_other_sort_is_invalid():
+    token = _token({"s": "title", "o": "asc", "v": "Матриця", "id": 1})
+    with pytest.raises(InvalidCursor, match="does not match"):
+        decode_cursor(token, "title", "desc")
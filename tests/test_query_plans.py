@@ -0,0 +1,244 @@
+"""
+Регресія планів запитів: EXPLAIN кожного запиту, який ендпоїнти виконують над фільмами,
+на засіяній Postgres. Повне читання movies / movie_genres / movie_changes — падіння.
+
+EXPLAIN виконується з вимкненими seqscan / hashjoin / mergejoin: на тестовому обсязі повне читання
+часто дешевше за індекс, а так воно лишається в плані тільки коли індексу для запиту немає —
+результат не залежить від розміру засіву.
+
+Потрібна БД зі схемою останньої версії:
+    DATABASE_URL=postgresql+asyncpg://... python -m app.database.migrations upgrade
+    DATABASE_URL=postgresql+asyncpg://... pytest tests/test_query_plans.py
+Без DATABASE_URL модуль пропускається.
+"""
+
+import os
+import uuid
+
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL is not set", allow_module_level=True)
+
+import fakeredis
+import httpx
+import pytest_asyncio
+from sqlalchemy import event, text
+
+import app.core.redis_client as redis_client
+from app.auth.security import create_access_token
+from app.core.main import app
+from app.database.database import async_session, engine
+
+pytestmark = pytest.mark.asyncio(loop_scope="module")
+
+# Великі таблиці — по них не має бути повного сканування
+WATCHED_RELATIONS = {"movies", "movie_genres", "movie_changes"}
+
+# Без цих стратегій планувальник обирає повне читання лише коли індексу немає
+PLANNER_OFF = ("enable_seqscan", "enable_hashjoin", "enable_mergejoin")
+
+# Засів: юзер під тестом + "шум" інших юзерів, щоб вибірка по user_id була селективною
+NOISE_USERS = 40
+MOVIES_PER_USER = 1000
+GENRES = 10
+CHANGES_SINCE = MOVIES_PER_USER - 100
+
+
+async def _seed(tag: str) -> str:
+    """Засіяти юзерів, фільми, жанри і журнал змін; повертає email юзера під тестом."""
+    like = f"plans-{tag}-%"
+    async with async_session() as db:
+        await db.execute(text("""
+            INSERT INTO users (email, username, hashed_password, created_at, is_active, change_seq)
+            SELECT 'plans-' || :tag || '-' || g || '@example.com', 'plans-' || :tag || '-' || g,
+                   'x', now(), true, :per_user
+            FROM generate_series(0, :noise) g
+        """), {"tag": tag, "noise": NOISE_USERS, "per_user": MOVIES_PER_USER})
+
+        await db.execute(text("""
+            INSERT INTO genres (name)
+            SELECT 'Plan ' || :tag || ' ' || g FROM generate_series(0, :genres - 1) g
+        """), {"tag": tag, "genres": GENRES})
+
+        await db.execute(text("""
+            INSERT INTO movies (user_id, title, year, genre, status, user_rating, watch_date, added_date)
+            SELECT u.id, 'Movie ' || g, 1950 + g % 70, 'Plan ' || :tag || ' ' || g % :genres,
+                   (ARRAY['want_to_watch', 'watching', 'watched'])[1 + g % 3]::moviestatus,
+                   CASE WHEN g % 4 = 0 THEN NULL ELSE g % 10 END,
+                   CASE WHEN g % 3 = 2 THEN now() - g * interval '1 day' END,
+                   now() - g * interval '1 hour'
+            FROM users u, generate_series(1, :per_user) g
+            WHERE u.email LIKE :like
+        """), {"tag": tag, "genres": GENRES, "per_user": MOVIES_PER_USER, "like": like})
+
+        await db.execute(text("""
+            INSERT INTO movie_genres (movie_id, genre_id)
+            SELECT m.id, gr.id
+            FROM movies m
+            JOIN users u ON u.id = m.user_id
+            JOIN genres gr ON gr.name = m.genre
+            WHERE u.email LIKE :like
+        """), {"like": like})
+
+        await db.execute(text("""
+            INSERT INTO movie_changes (user_id, seq, movie_id)
+            SELECT m.user_id, row_number() OVER (PARTITION BY m.user_id ORDER BY m.id), m.id
+            FROM movies m
+            JOIN users u ON u.id = m.user_id
+            WHERE u.email LIKE :like
+        """), {"like": like})
+        await db.commit()
+
+    # ANALYZE — щоб планувальник бачив реальні розміри, а не порожні таблиці
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in ("users", "genres", "movies", "movie_genres", "movie_changes"):
+            await conn.execute(text(f"ANALYZE {table}"))
+
+    return f"plans-{tag}-0@example.com"
+
+
+async def _cleanup(tag: str) -> None:
+    like = f"plans-{tag}-%"
+    async with async_session() as db:
+        await db.execute(text(
+            "DELETE FROM movies WHERE user_id IN (SELECT id FROM users WHERE email LIKE :like)"
+        ), {"like": like})
+        await db.execute(text("DELETE FROM users WHERE email LIKE :like"), {"like": like})
+        await db.execute(text("DELETE FROM genres WHERE name LIKE :name"), {"name": f"Plan {tag} %"})
+        await db.commit()
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def seeded():
+    """(client, tag): засіяна БД, fakeredis замість Redis і авторизований клієнт."""
+    original = redis_client.redis_client
+    redis_client.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+    tag = uuid.uuid4().hex[:8]
+    email = await _seed(tag)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers)
+    try:
+        yield client, tag
+    finally:
+        await client.aclose()
+        await _cleanup(tag)
+        await redis_client.redis_client.aclose()
+        redis_client.redis_client = original
+        await engine.dispose()
+
+
+async def _captured_queries(client: httpx.AsyncClient, url: str) -> list[tuple[str, tuple]]:
+    """SELECT'и, які виконав один запит до ендпоїнта (SQL + параметри драйвера)."""
+    queries: list[tuple[str, tuple]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            queries.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get(url)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+    assert response.status_code == 200, response.text
+    return queries
+
+
+def _full_scans(plan: dict) -> list[str]:
+    """Вузли плану, що читають таблицю з WATCHED_RELATIONS повністю (Seq Scan або індекс без умови)."""
+    found = []
+    if plan.get("Relation Name") in WATCHED_RELATIONS:
+        node = plan["Node Type"]
+        if node == "Seq Scan" or (node in ("Index Scan", "Index Only Scan") and "Index Cond" not in plan):
+            found.append(f"{node} on {plan['Relation Name']}")
+    for child in plan.get("Plans", []):
+        found += _full_scans(child)
+    return found
+
+
+def _reads_unbounded(plan: dict) -> bool:
+    """Під вузлом є читання великої таблиці, не обмежене LIMIT."""
+    if plan.get("Relation Name") in WATCHED_RELATIONS:
+        return True
+    if plan["Node Type"] == "Limit":
+        return False
+    return any(_reads_unbounded(child) for child in plan.get("Plans", []))
+
+
+def _unbounded_sorts(plan: dict) -> int:
+    """Sort над усіма рядками юзера (а не над кількома LIMIT-ами з індексу)."""
+    children = plan.get("Plans", [])
+    found = plan["Node Type"] == "Sort" and any(_reads_unbounded(child) for child in children)
+    return found + sum(_unbounded_sorts(child) for child in children)
+
+
+async def _assert_indexed(queries: list[tuple[str, tuple]], presorted: bool = False) -> None:
+    """
+    Жоден запит не читає великі таблиці повністю.
+    presorted — ще й порядок сторінки дає індекс (keyset не сортує весь список юзера).
+    """
+    assert queries, "endpoint ran no SELECT"
+    async with engine.connect() as conn:
+        for setting in PLANNER_OFF:
+            await conn.execute(text(f"SET {setting} = off"))
+        for statement, parameters in queries:
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar_one()[0]["Plan"]
+            scans = _full_scans(plan)
+            assert not scans, f"{', '.join(scans)} in plan of:\n{statement}"
+            if presorted:
+                assert not _unbounded_sorts(plan), f"Sort of the whole list in plan of:\n{statement}"
+        await conn.rollback()
+
+
+async def _next_page_url(client: httpx.AsyncClient, url: str) -> str:
+    response = await client.get(url)
+    assert response.status_code == 200, response.text
+    cursor = response.headers["X-Next-Cursor"]
+    return str(httpx.URL(url).copy_merge_params({"cursor": cursor}))
+
+
+SORTS = ["added_date", "year", "user_rating", "title"]
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", SORTS)
+async def test_list_first_page(seeded, sort, order):
+    client, _ = seeded
+    await _assert_indexed(await _captured_queries(client, f"/movies/?sort={sort}&order={order}&limit=50"), presorted=True)
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+@pytest.mark.parametrize("sort", SORTS)
+async def test_list_keyset_page(seeded, sort, order):
+    client, _ = seeded
+    # Третя сторінка — курсор вже не на межі NULL/не-NULL для nullable сортувань
+    url = f"/movies/?sort={sort}&order={order}&limit=400"
+    url = await _next_page_url(client, await _next_page_url(client, url))
+    await _assert_indexed(await _captured_queries(client, url), presorted=True)
+
+
+async def test_list_by_genre(seeded):
+    client, tag = seeded
+    await _assert_indexed(await _captured_queries(client, f"/movies/?genre=Plan {tag} 3"))
+
+
+async def test_list_by_title(seeded):
+    client, _ = seeded
+    await _assert_indexed(await _captured_queries(client, "/movies/?title=Movie 12"))
+
+
+async def test_stats_rebuild(seeded):
+    client, _ = seeded
+    # Порожній fakeredis — агрегату немає, ендпоїнт перераховує його з БД
+    await redis_client.redis_client.flushall()
+    await _assert_indexed(await _captured_queries(client, "/movies/stats/"))
+
+
+async def test_changes(seeded):
+    client, _ = seeded
+    await _assert_indexed(await _captured_queries(client, f"/movies/changes?since={CHANGES_SINCE}"))
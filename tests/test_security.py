@@ -0,0 +1,91 @@
+import asyncio
+import json
+import threading
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.auth import security
+from app.auth.security import (
+    create_access_token, get_current_user, invalidate_principal, needs_rehash, verify_password,
+)
+from app.core.main import app
+
+EMAIL = "neo@example.com"
+
+
+def _snapshot(is_active: bool) -> dict:
+    return {"id": 1, "email": EMAIL, "username": "neo", "created_at": None, "is_active": is_active}
+
+
+@pytest.fixture(autouse=True)
+def clear_principal_cache():
+    security._principal_cache.clear()
+    yield
+    security._principal_cache.clear()
+
+
+async def test_active_user_is_accepted(fake_redis):
+    security._principal_cache.set(EMAIL, _snapshot(is_active=True))
+
+    user = await get_current_user(create_access_token({"sub": EMAIL}), db=None)
+    assert user.id == 1
+
+
+async def test_inactive_user_is_rejected(fake_redis):
+    security._principal_cache.set(EMAIL, _snapshot(is_active=False))
+
+    with pytest.raises(HTTPException) as error:
+        await get_current_user(create_access_token({"sub": EMAIL}), db=None)
+    assert error.value.status_code == 403
+
+
+async def test_invalidate_principal_drops_both_cache_levels(fake_redis):
+    security._principal_cache.set(EMAIL, _snapshot(is_active=True))
+    await fake_redis.set(f"auth:principal:{EMAIL}", json.dumps(_snapshot(is_active=True)))
+
+    await invalidate_principal(EMAIL)
+
+    assert security._principal_cache.get(EMAIL) is None
+    assert await fake_redis.get(f"auth:principal:{EMAIL}") is None
+
+
+def test_inactive_user_websocket_is_closed():
+    security._principal_cache.set(EMAIL, _snapshot(is_active=False))
+
+    with TestClient(app).websocket_connect(f"/ws?token={create_access_token({'sub': EMAIL})}") as ws:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_text()
+    assert closed.value.code == 4001
+    assert closed.value.reason == "User is inactive"
+
+
+def test_needs_rehash(monkeypatch):
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 12)
+    cheap = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode()
+
+    assert needs_rehash(cheap) is True
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)
+    assert needs_rehash(cheap) is False
+    assert needs_rehash("not-a-bcrypt-hash") is False
+
+
+async def test_bcrypt_queue_overflow_is_503(monkeypatch):
+    monkeypatch.setattr(security, "_bcrypt_slots", asyncio.Semaphore(1))
+    release = threading.Event()
+    # Єдиний слот зайнятий операцією, що чекає в пулі потоків
+    busy = asyncio.create_task(security._run_bcrypt(release.wait))
+    while not security._bcrypt_slots.locked():
+        await asyncio.sleep(0)
+
+    try:
+        with pytest.raises(HTTPException) as error:
+            await verify_password("secret", bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode())
+        assert error.value.status_code == 503
+        assert error.value.headers == {"Retry-After": "1"}
+    finally:
+        release.set()
+        await busy
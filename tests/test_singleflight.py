@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.cache import SingleFlight
+from app.services.tmdb import TMDB_BASE_URL, TMDBService
+
+CONCURRENCY = 1000
+
+
+class MockTMDB:
+    """Upstream TMDB на httpx.MockTransport: рахує запити по шляхах."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls: dict[str, int] = {}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/3")
+        self.calls[path] = self.calls.get(path, 0) + 1
+        # Відповідь не миттєва — решта запитів встигає прийти, поки перший в дорозі
+        await asyncio.sleep(self.delay)
+
+        if path == "/genre/movie/list":
+            return httpx.Response(200, json={"genres": [{"id": 18, "name": "Драма"}]})
+        if path == "/search/movie":
+            return httpx.Response(200, json={"results": [
+                {"id": 603, "title": "Матриця", "original_title": "The Matrix", "genre_ids": [18]}
+            ]})
+        if path.startswith("/movie/"):
+            return httpx.Response(200, json={"id": int(path.rsplit("/", 1)[1]), "title": "Матриця"})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+async def tmdb(fake_redis):
+    upstream = MockTMDB()
+    http_client = httpx.AsyncClient(base_url=TMDB_BASE_URL, transport=httpx.MockTransport(upstream.handler))
+    service = TMDBService(redis_client=fake_redis, http_client=http_client)
+    yield service, upstream
+    await http_client.aclose()
+
+
+async def test_concurrent_identical_searches_hit_upstream_once(tmdb):
+    service, upstream = tmdb
+
+    results = await asyncio.gather(*(service.search_and_format("  The MATRIX ") for _ in range(CONCURRENCY)))
+
+    assert upstream.calls["/search/movie"] == 1
+    assert all(result == results[0] for result in results)
+    assert results[0][0]["tmdb_id"] == 603
+    assert len(service._flight) == 0
+
+
+async def test_concurrent_identical_details_hit_upstream_once(tmdb):
+    service, upstream = tmdb
+
+    results = await asyncio.gather(*(service.get_details_formatted(603) for _ in range(CONCURRENCY)))
+
+    assert upstream.calls["/movie/603"] == 1
+    assert all(result == results[0] for result in results)
+
+
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "value"
+
+    leader = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(flight.do("key", fetch)) for _ in range(10)]
+    await asyncio.sleep(0)
+
+    # Клієнт першого запиту закрив з'єднання
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*followers) == ["value"] * 10
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert calls == 1
+    assert len(flight) == 0
+
+
+async def test_error_reaches_every_caller_and_key_is_released():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(flight.do("key", fetch) for _ in range(5)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == 1
+    assert len(flight) == 0
+
+    # Наступний виклик після помилки знову йде в upstream
+    with pytest.raises(RuntimeError):
+        await flight.do("key", fetch)
+    assert calls == 2
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.auth import security
+from app.auth.security import create_access_token
+from app.core.main import app
+from app.services.stats import apply_movie_delta
+
+EMAIL = "stats@example.com"
+USER_ID = 7
+
+
+@pytest.fixture
+async def client(fake_redis):
+    security._principal_cache.set(EMAIL, {
+        "id": USER_ID, "email": EMAIL, "username": "stats", "created_at": None, "is_active": True,
+    })
+    # Агрегат на seq 5: два переглянуті фільми
+    await fake_redis.hset(f"stats:{USER_ID}", mapping={
+        "_ready": 1, "_seq": 5, "_seen": 5, "s:watched": 2, "g:Драма": 2,
+    })
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': EMAIL})}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", headers=headers) as client:
+        yield client
+    security._principal_cache.clear()
+
+
+async def _get(client: httpx.AsyncClient, etag: str | None = None) -> httpx.Response:
+    return await client.get("/movies/stats/", headers={"If-None-Match": etag} if etag else {})
+
+
+WATCHED = SimpleNamespace(status="watched", genre="Драма", watch_date=None)
+
+
+async def test_stats_etag_follows_aggregate(client, fake_redis):
+    # users.change_seq вже може бути 6 (коміт пройшов), але поки дельта не застосована,
+    # віддається старий вміст — і ETag саме цього вмісту
+    response = await _get(client)
+    etag = response.headers["ETag"]
+    assert etag.startswith(f'W/"stats-{USER_ID}-')
+    assert response.json()["by_status"] == {"watched": 2}
+    assert (await _get(client, etag)).status_code == 304
+
+    await apply_movie_delta(fake_redis, USER_ID, 6, added=[WATCHED])
+
+    fresh = await _get(client, etag)
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert fresh.json()["by_status"] == {"watched": 3}
+
+
+async def test_stats_etag_changes_on_out_of_order_delta(client, fake_redis):
+    # Дві паралельні зміни: seq 7 застосувалась раніше за seq 6
+    await apply_movie_delta(fake_redis, USER_ID, 7, added=[WATCHED])
+    etag = (await _get(client)).headers["ETag"]
+
+    await apply_movie_delta(fake_redis, USER_ID, 6, added=[WATCHED])
+
+    late = await _get(client, etag)
+    assert late.status_code == 200
+    assert late.json()["by_status"] == {"watched": 4}
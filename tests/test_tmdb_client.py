@@ -0,0 +1,15 @@
+import logging
+import sys
+
+from app.services import tmdb
+
+
+async def test_http2_without_h2_falls_back_with_warning(monkeypatch, caplog):
+    monkeypatch.setattr(tmdb, "TMDB_HTTP2", True)
+    monkeypatch.setitem(sys.modules, "h2", None)  # import h2 → ImportError
+
+    with caplog.at_level(logging.WARNING, logger="watchlist.tmdb"):
+        client = tmdb.create_http_client()
+    await client.aclose()
+
+    assert "h2 is not installed" in caplog.text
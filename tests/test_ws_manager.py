@@ -0,0 +1,157 @@
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from app.core import ws_manager
+from app.core.ws_manager import CLOSE_IDLE, CLOSE_TRY_AGAIN, CLOSE_USER_LIMIT, ConnectionManager
+
+
+class FakeWebSocket:
+    """Сокет без сервера: відправлене складається в sent, вхідні повідомлення — з черги incoming."""
+
+    def __init__(self):
+        self.sent: list[str] = []
+        self.closed: int | None = None
+        self.incoming: asyncio.Queue[str] = asyncio.Queue()
+
+    async def send_text(self, data: str):
+        self.sent.append(data)
+
+    async def receive_text(self) -> str:
+        return await self.incoming.get()
+
+    async def close(self, code: int = 1000, reason: str | None = None):
+        self.closed = code
+
+
+class StuckWebSocket(FakeWebSocket):
+    """Клієнт, що не читає: перша ж відправка не завершується."""
+
+    async def send_text(self, data: str):
+        await asyncio.Event().wait()
+
+
+async def _settle():
+    # Закриття сокетів і скасування writer-ів відбуваються у фонових задачах
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def test_per_user_cap(monkeypatch):
+    monkeypatch.setattr(ws_manager, "WS_MAX_PER_USER", 2)
+    manager = ConnectionManager()
+
+    assert await manager.connect(1, FakeWebSocket()) is None
+    assert await manager.connect(1, FakeWebSocket()) is None
+    assert await manager.connect(1, FakeWebSocket()) == CLOSE_USER_LIMIT
+    # Ліміт — на юзера, інші підключаються
+    assert await manager.connect(2, FakeWebSocket()) is None
+
+    assert manager.stats()["connections"] == 3
+    assert manager.counters["rejected"] == 1
+    await manager.stop()
+
+
+async def test_global_cap(monkeypatch):
+    monkeypatch.setattr(ws_manager, "WS_MAX_CONNECTIONS", 3)
+    manager = ConnectionManager()
+    sockets = [FakeWebSocket() for _ in range(3)]
+
+    for user_id, websocket in enumerate(sockets):
+        assert await manager.connect(user_id, websocket) is None
+    assert await manager.connect(99, FakeWebSocket()) == CLOSE_TRY_AGAIN
+
+    # Звільнене місце знову доступне
+    await manager.disconnect(0, sockets[0])
+    assert await manager.connect(99, FakeWebSocket()) is None
+    await manager.stop()
+
+
+async def test_idle_socket_is_pinged_then_reaped(monkeypatch):
+    monkeypatch.setattr(ws_manager, "WS_PING_INTERVAL", 0.01)
+    monkeypatch.setattr(ws_manager, "WS_IDLE_TIMEOUT", 0.05)
+    manager = ConnectionManager()
+    websocket = FakeWebSocket()
+    await manager.connect(1, websocket)
+
+    await asyncio.wait_for(manager.listen(1, websocket), 1)
+    await _settle()
+
+    assert json.dumps({"event": "ping"}) in websocket.sent
+    assert websocket.closed == CLOSE_IDLE
+    assert manager.counters["reaped"] == 1
+    assert manager.stats()["connections"] == 0
+
+
+async def test_client_messages_keep_socket_alive(monkeypatch):
+    monkeypatch.setattr(ws_manager, "WS_PING_INTERVAL", 0.01)
+    monkeypatch.setattr(ws_manager, "WS_IDLE_TIMEOUT", 0.05)
+    manager = ConnectionManager()
+    websocket = FakeWebSocket()
+    await manager.connect(1, websocket)
+
+    async def pong_for(seconds: float):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            websocket.incoming.put_nowait('{"event": "pong"}')
+            await asyncio.sleep(0.02)
+
+    started = time.monotonic()
+    await asyncio.gather(pong_for(0.2), asyncio.wait_for(manager.listen(1, websocket), 1))
+
+    # Закритий лише після того, як клієнт замовк
+    assert time.monotonic() - started >= 0.2
+    assert manager.counters["reaped"] == 1
+
+
+async def test_soak_10k_connections_memory_is_bounded(monkeypatch):
+    users, tabs = 1000, 10
+    monkeypatch.setattr(ws_manager, "WS_MAX_CONNECTIONS", users * tabs)
+    monkeypatch.setattr(ws_manager, "WS_SEND_QUEUE_SIZE", 8)
+    monkeypatch.setattr(ws_manager, "WS_SLOW_CONSUMER", "drop")
+    manager = ConnectionManager()
+    sockets = {user_id: [StuckWebSocket() for _ in range(tabs)] for user_id in range(users)}
+
+    async def broadcast(rounds: int):
+        for n in range(rounds):
+            for user_id in sockets:
+                await manager.broadcast_to_user(user_id, {"event": "updated", "seq": n})
+        await _settle()
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for user_id, websockets in sockets.items():
+            for websocket in websockets:
+                assert await manager.connect(user_id, websocket) is None
+        connected = tracemalloc.get_traced_memory()[0]
+
+        # Клієнти не читають: черги заповнюються до WS_SEND_QUEUE_SIZE, далі старе викидається
+        await broadcast(ws_manager.WS_SEND_QUEUE_SIZE * 2)
+        full = tracemalloc.get_traced_memory()[0]
+        await broadcast(ws_manager.WS_SEND_QUEUE_SIZE * 2)
+        steady = tracemalloc.get_traced_memory()[0]
+
+        for user_id, websockets in sockets.items():
+            for websocket in websockets:
+                await manager.disconnect(user_id, websocket)
+        await _settle()
+        # Скасовані writer-и — цикли задача ↔ корутина; їх прибирає збирач сміття, а не refcount
+        gc.collect()
+        released = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    per_connection = (connected - baseline) / (users * tabs)
+    print(f"\n{users * tabs} connections: {per_connection:.0f} B each, "
+          f"queues full +{(full - connected) / 1e6:.1f} MB, then +{(steady - full) / 1e6:.2f} MB, "
+          f"after disconnect +{(released - baseline) / 1e6:.2f} MB")
+
+    assert manager.stats() == {"connections": 0, "users": 0, "queued": 0, **manager.counters}
+    assert manager.counters["slow"] == 0
+    # Ще стільки ж подій не додають пам'яті — черги обмежені
+    assert steady - full < (full - baseline) * 0.05
+    # Після відключення майже все звільнено
+    assert released - baseline < (connected - baseline) * 0.1